@@ -1,13 +1,17 @@
-from flask import Flask, render_template, request, send_from_directory
+import time
+
+# Start-up phases are timed and reported once the app is warm
+_startup_begin = time.perf_counter()
+
+from flask import Flask, Response, jsonify, render_template, request, send_from_directory
 import os
 import sys
 import json
 import joblib
+import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-from werkzeug.utils import secure_filename
-from pydub import AudioSegment
-import librosa
-import speech_recognition as sr
 
 # -------------------------
 # Path setup
@@ -15,7 +19,27 @@ import speech_recognition as sr
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(BASE_DIR, "src"))
 
-from src.features.audio_features import AudioFeatureExtractor
+from src.features.audio_features import FEATURE_PROFILES, AudioFeatureExtractor, group_columns
+from src.models.forest_engine import (
+    estimator_tree_proba, is_compilable, load_or_compile, progressive_proba
+)
+from src.features.parallel import (
+    default_workers, extract_array, extract_array_timed, extract_arrays, init_worker,
+    parallel_map_chunks
+)
+from src.features.segmentation import EnergySegmenter, summarize_timeline
+from src.models.feedback import FeedbackStore
+from src.utils.batching import MicroBatcher
+from src.utils.audio_io import decode_audio, iter_audio_blocks, write_wav
+from src.utils.cache import PredictionCache
+from src.utils.metrics import (
+    CASCADE, GATED, PREDICTIONS, STAGE_SECONDS, STARTUP_SECONDS, TREES_EVALUATED,
+    UNCERTAIN, Gauge, instrument, observe_feature_group, render as render_metrics,
+    reset as reset_metrics
+)
+from src.utils.profiling import PROFILE_HEADER, RequestProfiler, annotate, is_profiling
+from src.utils.workspace import Janitor, WorkspaceStore
+from src.utils.transcription import TranscriptionService, create_backend
 from src.utils.helpers import get_confidence_color, get_emotion_emoji
 
 # -------------------------
@@ -23,26 +47,258 @@ from src.utils.helpers import get_confidence_color, get_emotion_emoji
 # -------------------------
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 TEMP_DIR = os.path.join(BASE_DIR, "temp")
-STATIC_RECORDINGS_DIR = os.path.join("src", "static", "recordings")
+STATIC_RECORDINGS_DIR = os.path.join(BASE_DIR, "src", "static", "recordings")
+
+# Server-side paths accepted by /api/predict_batch must live under this root
+BATCH_ROOT = os.path.abspath(
+    os.environ.get("SER_BATCH_ROOT", os.path.join(BASE_DIR, "dataset"))
+)
+BATCH_MAX_ITEMS = int(os.environ.get("SER_BATCH_MAX_ITEMS", 256))
+EXTRACT_WORKERS = int(os.environ.get("SER_EXTRACT_WORKERS", default_workers()))
+
+# Transcription runs in the background; "static" is an offline stand-in
+TRANSCRIBER = os.environ.get("SER_TRANSCRIBER", "google")
+TRANSCRIBE_WORKERS = int(os.environ.get("SER_TRANSCRIBE_WORKERS", 4))
+TRANSCRIBE_TIMEOUT = float(os.environ.get("SER_TRANSCRIBE_TIMEOUT", 15))
+
+# "sklearn" runs the pickled estimator, "compiled" the array-backed forest
+INFERENCE_BACKEND = os.environ.get("SER_INFERENCE_BACKEND", "sklearn")
+
+# Early exit: with SER_EARLY_EXIT_TOLERANCE > 0 forests are evaluated in
+# chunks of SER_EARLY_EXIT_CHUNK trees (at least SER_EARLY_EXIT_MIN_TREES)
+# and each row stops once its top three and their confidences are settled
+EARLY_EXIT_TOLERANCE = float(os.environ.get("SER_EARLY_EXIT_TOLERANCE", 0))
+EARLY_EXIT_CHUNK = int(os.environ.get("SER_EARLY_EXIT_CHUNK", 25))
+EARLY_EXIT_MIN_TREES = int(os.environ.get("SER_EARLY_EXIT_MIN_TREES", 50))
+
+# Predictions below this confidence (%) are reported as "uncertain"
+UNCERTAIN_BELOW = 35
+
+# librosa resampler for uploads; the live mic path favours speed
+RESAMPLE_QUALITY = os.environ.get("SER_RESAMPLE_QUALITY", "soxr_hq")
+LIVE_RESAMPLE_QUALITY = os.environ.get("SER_LIVE_RESAMPLE_QUALITY", "soxr_lq")
 
-os.makedirs(TEMP_DIR, exist_ok=True)
-os.makedirs(STATIC_RECORDINGS_DIR, exist_ok=True)
+# Single-row inference from concurrent requests is collected for up to
+# SER_MICROBATCH_WINDOW_MS or SER_MICROBATCH_ROWS rows and run as one batch
+MICROBATCH_WINDOW_MS = float(os.environ.get("SER_MICROBATCH_WINDOW_MS", 5))
+MICROBATCH_ROWS = int(os.environ.get("SER_MICROBATCH_ROWS", 32))
+
+# Feature profile: "full" uses models/, others their own artifacts in
+# models/profiles/<name>/ (see the trainer's group analysis to choose)
+FEATURE_PROFILE = os.environ.get("SER_FEATURE_PROFILE", "full")
+if FEATURE_PROFILE not in FEATURE_PROFILES:
+    raise ValueError(f"Unknown SER_FEATURE_PROFILE: {FEATURE_PROFILE}")
+FEATURE_GROUPS = FEATURE_PROFILES[FEATURE_PROFILE]
+PROFILE_DIR = (
+    MODELS_DIR if FEATURE_PROFILE == "full"
+    else os.path.join(MODELS_DIR, "profiles", FEATURE_PROFILE)
+)
+
+# Cheap-first cascade: with SER_CASCADE_THRESHOLD > 0 (a confidence in %),
+# single clips are first scored on the SER_CASCADE_PROFILE groups by that
+# profile's model; only clips below the threshold extract the remaining
+# groups and go to the full model
+CASCADE_THRESHOLD = float(os.environ.get("SER_CASCADE_THRESHOLD", 0))
+CASCADE_PROFILE = os.environ.get("SER_CASCADE_PROFILE", "cheap")
+if CASCADE_THRESHOLD > 0 and FEATURE_PROFILE != "full":
+    raise ValueError("SER_CASCADE_THRESHOLD needs SER_FEATURE_PROFILE=full")
+if CASCADE_PROFILE not in FEATURE_PROFILES:
+    raise ValueError(f"Unknown SER_CASCADE_PROFILE: {CASCADE_PROFILE}")
+CASCADE_GROUPS = FEATURE_PROFILES[CASCADE_PROFILE]
+CASCADE_REST = tuple(g for g in FEATURE_GROUPS if g not in CASCADE_GROUPS)
+CASCADE_DIR = os.path.join(MODELS_DIR, "profiles", CASCADE_PROFILE)
+
+# Streaming mode: rolling analysis window, update interval and session limits
+STREAM_WINDOW = float(os.environ.get("SER_STREAM_WINDOW", 3.0))
+STREAM_UPDATE = float(os.environ.get("SER_STREAM_UPDATE", 0.5))
+STREAM_IDLE_TIMEOUT = float(os.environ.get("SER_STREAM_IDLE_TIMEOUT", 60))
+STREAM_MAX_SESSIONS = int(os.environ.get("SER_STREAM_MAX_SESSIONS", 16))
+
+# Long recordings are decoded in blocks and scored per voiced segment
+LONG_BLOCK_SECONDS = float(os.environ.get("SER_LONG_BLOCK_SECONDS", 30))
+SEGMENT_MIN_SECONDS = float(os.environ.get("SER_SEGMENT_MIN_SECONDS", 1.0))
+SEGMENT_MAX_SECONDS = float(os.environ.get("SER_SEGMENT_MAX_SECONDS", 8.0))
+
+# Run a synthetic clip through the pipeline before serving traffic
+WARMUP = os.environ.get("SER_WARMUP", "1").lower() not in ("0", "false", "no")
+
+# Every request gets its own directory; files are kept for playback until
+# SER_WORKSPACE_TTL seconds after the request, within a per-directory quota
+WORKSPACE_TTL = float(os.environ.get("SER_WORKSPACE_TTL", 3600))
+WORKSPACE_QUOTA_MB = float(os.environ.get("SER_WORKSPACE_QUOTA_MB", 500))
+JANITOR_INTERVAL = float(os.environ.get("SER_JANITOR_INTERVAL", 60))
+
+temp_store = WorkspaceStore(
+    "temp", TEMP_DIR, "/temp",
+    ttl=WORKSPACE_TTL, max_bytes=int(WORKSPACE_QUOTA_MB * (1 << 20))
+)
+recordings_store = WorkspaceStore(
+    "recordings", STATIC_RECORDINGS_DIR, "/static/recordings",
+    ttl=WORKSPACE_TTL, max_bytes=int(WORKSPACE_QUOTA_MB * (1 << 20))
+)
+# Started by create_app(), not on import
+janitor = Janitor([temp_store, recordings_store], interval=JANITOR_INTERVAL)
+
+# Profiling: requests carrying SER_PROFILING_TOKEN (X-SER-Profile header or
+# ?profile=) and 1 in SER_PROFILING_SAMPLE requests are profiled; the token
+# also unlocks /profiles. Without either, profiling never runs.
+PROFILING_DIR = os.environ.get("SER_PROFILING_DIR", os.path.join(BASE_DIR, "profiles"))
+profiler = RequestProfiler(
+    PROFILING_DIR,
+    token=os.environ.get("SER_PROFILING_TOKEN") or None,
+    sample_every=int(os.environ.get("SER_PROFILING_SAMPLE", 0)),
+    interval=float(os.environ.get("SER_PROFILING_INTERVAL_MS", 1)) / 1000,
+    keep=int(os.environ.get("SER_PROFILING_KEEP", 50))
+)
+
+# Free-text feedback is appended to feedback.txt; confirmed or corrected
+# labels also store the scored features for src/models/updater.py
+FEEDBACK_LOG = os.path.join(BASE_DIR, "feedback.txt")
+feedback_store = FeedbackStore()
+feedback_lock = threading.Lock()
 
 # -------------------------
 # Load model artifacts
 # -------------------------
-model = joblib.load(os.path.join(MODELS_DIR, "model.pkl"))
-scaler = joblib.load(os.path.join(MODELS_DIR, "scaler.pkl"))
-encoder = joblib.load(os.path.join(MODELS_DIR, "label_encoder.pkl"))
+MODEL_PATH = os.path.join(PROFILE_DIR, "model.pkl")
+SCALER_PATH = os.path.join(PROFILE_DIR, "scaler.pkl")
+COMPILED_PATH = os.path.join(PROFILE_DIR, "model_compiled.pkl")
+
+
+class ModelArtifacts:
+    """One consistent set of trained artifacts.
+
+    Everything is loaded before the set is published, and readers take
+    the whole set at once, so a reload never mixes a new model with an
+    old scaler or encoder.
+    """
+
+    def __init__(self):
+        self.scaler = joblib.load(SCALER_PATH)
+        self.encoder = joblib.load(os.path.join(PROFILE_DIR, "label_encoder.pkl"))
+
+        # The compiled forest has the scaler merged in and takes raw features.
+        # Its arrays are memory-mapped, so workers on one host share the pages,
+        # and the sklearn estimator is only unpickled when it is actually used
+        # (non-forest models selected by the trainer stay on sklearn).
+        self.compiled = (
+            load_or_compile(MODEL_PATH, SCALER_PATH, COMPILED_PATH, mmap_mode="r")
+            if INFERENCE_BACKEND == "compiled" else None
+        )
+        self.model = joblib.load(MODEL_PATH) if self.compiled is None else None
+
+        # Per-tree probabilities for early exit; None runs the whole model
+        self.tree_proba = None
+        if EARLY_EXIT_TOLERANCE > 0:
+            if self.compiled is not None:
+                self.tree_proba = (self.compiled.tree_proba, len(self.compiled.roots))
+            elif is_compilable(self.model):
+                self.tree_proba = (estimator_tree_proba(self.model), len(self.model.estimators_))
+            else:
+                print(f"Early exit needs a forest, {type(self.model).__name__} runs in full")
+
+        with open(os.path.join(PROFILE_DIR, "model_metrics.json")) as f:
+            self.metrics = json.load(f)
+
+        # Stage one of the cascade: raw rows of the cascade groups -> probabilities
+        self.cascade_proba = None
+        if CASCADE_THRESHOLD > 0:
+            stage_encoder = joblib.load(os.path.join(CASCADE_DIR, "label_encoder.pkl"))
+            if not np.array_equal(stage_encoder.classes_, self.encoder.classes_):
+                raise ValueError(f"{CASCADE_PROFILE} model was trained on other classes")
+            stage_model = os.path.join(CASCADE_DIR, "model.pkl")
+            stage_scaler = os.path.join(CASCADE_DIR, "scaler.pkl")
+            compiled = (
+                load_or_compile(stage_model, stage_scaler,
+                                os.path.join(CASCADE_DIR, "model_compiled.pkl"), mmap_mode="r")
+                if INFERENCE_BACKEND == "compiled" else None
+            )
+            if compiled is not None:
+                self.cascade_proba = compiled.predict_proba
+            else:
+                m, s = joblib.load(stage_model), joblib.load(stage_scaler)
+                self.cascade_proba = lambda X: m.predict_proba(s.transform(X))
 
-with open(os.path.join(MODELS_DIR, "model_metrics.json")) as f:
-    model_metrics = json.load(f)
+    def proba(self, X):
+        """Class probabilities for raw feature rows on the configured backend"""
+        if self.compiled is None:
+            with STAGE_SECONDS.time(stage="scale"):
+                X = self.scaler.transform(X)
+        estimator = self.compiled if self.compiled is not None else self.model
+
+        if self.tree_proba is None:
+            with STAGE_SECONDS.time(stage="inference"):
+                return estimator.predict_proba(X)
+
+        with STAGE_SECONDS.time(stage="inference"):
+            proba, used = progressive_proba(
+                *self.tree_proba, X, tolerance=EARLY_EXIT_TOLERANCE, chunk=EARLY_EXIT_CHUNK,
+                min_trees=EARLY_EXIT_MIN_TREES, threshold=UNCERTAIN_BELOW / 100
+            )
+        for n in used:
+            TREES_EVALUATED.observe(n)
+        annotate(trees_evaluated=int(used.max()))
+        return proba
+
+
+def load_artifacts():
+    """Load a new artifact set and swap it in with a single assignment"""
+    global artifacts
+    artifacts = ModelArtifacts()
+
+
+_imports_done = time.perf_counter()
+load_artifacts()
+_artifacts_done = time.perf_counter()
 
 # -------------------------
 # Objects
 # -------------------------
-extractor = AudioFeatureExtractor(sample_rate=16000)
-recognizer = sr.Recognizer()
+extractor = AudioFeatureExtractor(
+    sample_rate=16000, group_hook=observe_feature_group, groups=FEATURE_GROUPS
+)
+init_worker(FEATURE_GROUPS)
+# Inline extractors for the two cascade stages
+cascade_extractors = {
+    groups: AudioFeatureExtractor(
+        sample_rate=16000, group_hook=observe_feature_group, groups=groups
+    )
+    for groups in (CASCADE_GROUPS, CASCADE_REST)
+} if CASCADE_THRESHOLD > 0 else {}
+transcriber = TranscriptionService(
+    create_backend(TRANSCRIBER, timeout=TRANSCRIBE_TIMEOUT),
+    max_workers=TRANSCRIBE_WORKERS,
+    timeout=TRANSCRIBE_TIMEOUT
+)
+
+# Long-lived worker pool for batch feature extraction, created on first use
+extraction_pool = None
+
+# Results are keyed by PCM hash + scoring settings + model.pkl digest; a
+# retrained model clears the cache and is reloaded here before the next
+# prediction.
+prediction_cache = PredictionCache(
+    MODEL_PATH,
+    max_entries=int(os.environ.get("SER_CACHE_SIZE", 256)),
+    cache_dir=os.environ.get("SER_CACHE_DIR") or None,
+    on_invalidate=load_artifacts,
+    settings={
+        "profile": FEATURE_PROFILE,
+        "cascade": CASCADE_THRESHOLD,
+        "early_exit": (EARLY_EXIT_TOLERANCE, EARLY_EXIT_CHUNK, EARLY_EXIT_MIN_TREES)
+        if EARLY_EXIT_TOLERANCE > 0 else 0
+    }
+)
+
+# Live streaming sessions: id -> {"extractor", "lock", "seen"}
+stream_sessions = {}
+stream_lock = threading.Lock()
+
+# Gauges read at scrape time
+Gauge("ser_transcription_pending", "Transcription jobs queued or running",
+      fn=lambda: transcriber.pending)
+Gauge("ser_stream_sessions", "Open live streaming sessions",
+      fn=lambda: len(stream_sessions))
 
 # -------------------------
 # Flask app
@@ -56,92 +312,388 @@ app = Flask(
 # -------------------------
 # Utilities
 # -------------------------
-def transcribe_audio(wav_path):
-    try:
-        with sr.AudioFile(wav_path) as source:
-            audio = recognizer.record(source)
+class ClipTooShort(ValueError):
+    """No features could be extracted (clips under 0.5 s, unreadable audio)"""
+
+
+def start_transcription(y, sample_rate=16000, key=None):
+    """Queue y for transcription and return a job id for /transcript"""
+    key = key or prediction_cache.key_for(y, sample_rate)
+    entry = prediction_cache.get(key, "transcript")
+    if entry is not None:
+        return transcriber.completed(entry["transcript"])
+
+    # Only successful transcripts are cached so a retry can still succeed
+    return transcriber.submit(
+        y, sample_rate,
+        on_done=lambda text: prediction_cache.put(key, transcript=text)
+    )
+
+
+def model_proba(X):
+    """Class probabilities for raw feature rows on the configured backend"""
+    return artifacts.proba(X)
+
 
-        text = recognizer.recognize_google(audio)
-        print("TRANSCRIPT:", text)
-        return text
+# SER_MICROBATCH_ROWS=1 scores every request on its own
+inference_batcher = (
+    MicroBatcher(model_proba, MICROBATCH_ROWS, MICROBATCH_WINDOW_MS / 1000,
+                 n_features=len(group_columns(FEATURE_GROUPS)))
+    if MICROBATCH_ROWS > 1 else None
+)
+
+
+def extract_features(y, groups=None):
+    """Extract on the worker pool, so request threads never hold the GIL
+    through CPU-bound librosa work; inline when there is no pool.
+    ``groups`` (a cascade stage) extracts only those columns."""
+    pool = get_extraction_pool()
+    # Profiled requests do all their work on their own thread, where the
+    # stack sampler can see it
+    if pool is None or is_profiling():
+        return cascade_extractors.get(groups, extractor).extract_from_array(y)
 
-    except sr.UnknownValueError:
-        print("Transcript: Speech not clear")
-        return "Speech not clear enough to transcribe"
+    features, timings = pool.submit(extract_array_timed, y, 16000, groups).result()
+    for group, seconds in timings:
+        observe_feature_group(group, seconds)
+    return features
 
-    except sr.RequestError as e:
-        print("Transcript API error:", e)
-        return "Speech service unavailable"
 
-    except Exception as e:
-        print("Transcript error:", e)
-        return "Transcript not available"
+def clip_rms(y):
+    """Mean frame RMS, the energy gate's measure"""
+    # librosa's feature modules take seconds to load; only scoring needs them
+    import librosa
+    return np.mean(librosa.feature.rms(y=y))
 
 
-def predict_emotion(wav_path):
+def score_audio(y):
     # Energy gating
-    y, _ = librosa.load(wav_path, sr=16000)
-    rms = np.mean(librosa.feature.rms(y=y))
+    with STAGE_SECONDS.time(stage="gate"):
+        rms = clip_rms(y)
 
     if rms < 0.01:
+        GATED.inc()
+        return None, None
+
+    if artifacts.cascade_proba is not None:
+        return score_cascade(y)
+
+    with STAGE_SECONDS.time(stage="features"):
+        features = extract_features(y)
+    return features, score_features(features)
+
+
+def score_features(features):
+    """Full-model probabilities for one feature row"""
+    if features is None:
+        raise ClipTooShort("clip too short for feature extraction")
+    if inference_batcher is None or is_profiling():
+        return model_proba(features.reshape(1, -1))[0]
+    return inference_batcher(features)
+
+
+def score_cascade(y):
+    """Score on the cheap groups; extract the rest only when unsure.
+
+    Clips decided by stage one return no features, since a partial row
+    cannot be stored as feedback for the full model.
+    """
+    with STAGE_SECONDS.time(stage="features"):
+        cheap = extract_features(y, CASCADE_GROUPS)
+    if cheap is None:
+        raise ClipTooShort("clip too short for feature extraction")
+    with STAGE_SECONDS.time(stage="cascade"):
+        proba = artifacts.cascade_proba(cheap.reshape(1, -1))[0]
+    if proba.max() * 100 >= CASCADE_THRESHOLD:
+        CASCADE.inc(stage="one")
+        return None, proba
+
+    CASCADE.inc(stage="two")
+    with STAGE_SECONDS.time(stage="features"):
+        rest = extract_features(y, CASCADE_REST)
+    if rest is None:
+        raise ClipTooShort("clip too short for feature extraction")
+    features = np.empty(len(cheap) + len(rest), dtype=np.float32)
+    features[group_columns(CASCADE_GROUPS)] = cheap
+    features[group_columns(CASCADE_REST)] = rest
+    return features, score_features(features)
+
+
+def decode_predictions(probas):
+    # Vectorized over rows: one inverse_transform for every label we need
+    probas = np.atleast_2d(probas)
+    rows = np.arange(len(probas))
+
+    idx = np.argmax(probas, axis=1)
+    confidences = probas[rows, idx] * 100
+    top3 = np.argsort(probas, axis=1)[:, ::-1][:, :3]
+    labels = artifacts.encoder.inverse_transform(np.hstack([idx, top3.ravel()]))
+    emotions = labels[:len(idx)]
+    top_labels = labels[len(idx):].reshape(top3.shape)
+
+    results = []
+    for r in rows:
+        emotion = emotions[r]
+        # Uncertainty handling
+        if confidences[r] < UNCERTAIN_BELOW:
+            emotion = "uncertain"
+            UNCERTAIN.inc()
+        PREDICTIONS.inc(emotion=emotion)
+
+        top_predictions = [
+            {
+                "emotion": top_labels[r, k],
+                "confidence": round(probas[r, i] * 100, 2),
+                "emoji": get_emotion_emoji(top_labels[r, k])
+            }
+            for k, i in enumerate(top3[r])
+        ]
+        results.append((emotion, round(confidences[r], 2), top_predictions))
+
+    return results
+
+
+def decode_prediction(proba):
+    # Gated (silent) clips carry no probabilities
+    if proba is None:
+        PREDICTIONS.inc(emotion="neutral")
         return "neutral", 40.0, []
 
-    features = extractor.extract(wav_path)
-    features = scaler.transform(features.reshape(1, -1))
+    return decode_predictions(proba)[0]
 
-    proba = model.predict_proba(features)[0]
-    idx = np.argmax(proba)
 
-    confidence = proba[idx] * 100
-    emotion = encoder.inverse_transform([idx])[0]
+def predict_emotion(y, key=None):
+    key = key or prediction_cache.key_for(y)
+    entry = prediction_cache.get(key, "proba")
 
-    # Uncertainty handling
-    if confidence < 35:
-        emotion = "uncertain"
+    if entry is None:
+        features, proba = score_audio(y)
+        prediction_cache.put(key, features=features, proba=proba)
+    else:
+        proba = entry["proba"]
 
-    top3 = np.argsort(proba)[::-1][:3]
-    top_predictions = [
-        {
-            "emotion": encoder.inverse_transform([i])[0],
-            "confidence": round(proba[i] * 100, 2),
-            "emoji": get_emotion_emoji(
-                encoder.inverse_transform([i])[0]
-            )
-        }
-        for i in top3
+    return decode_prediction(proba)
+
+def get_extraction_pool():
+    global extraction_pool
+    if extraction_pool is None and EXTRACT_WORKERS > 1:
+        extraction_pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            initializer=init_worker, initargs=(FEATURE_GROUPS, WARMUP)
+        )
+    return extraction_pool
+
+
+def predict_batch(signals, keys=None):
+    """Score many decoded clips with one scale and one predict_proba call"""
+    keys = keys or [prediction_cache.key_for(y) for y in signals]
+    probas = [None] * len(signals)
+
+    pending = []
+    for i, (key, y) in enumerate(zip(keys, signals)):
+        entry = prediction_cache.get(key, "proba")
+        if entry is not None:
+            probas[i] = entry["proba"]
+        elif clip_rms(y) < 0.01:
+            GATED.inc()
+            prediction_cache.put(key, features=None, proba=None)
+        else:
+            pending.append(i)
+
+    with STAGE_SECONDS.time(stage="batch_features"):
+        features = parallel_map_chunks(
+            extract_arrays, [signals[i] for i in pending],
+            n_jobs=EXTRACT_WORKERS, pool=get_extraction_pool()
+        )
+    scored = [(i, f) for i, f in zip(pending, features) if f is not None]
+
+    if scored:
+        X = np.vstack([f for _, f in scored])
+        P = model_proba(X)
+        for (i, f), proba in zip(scored, P):
+            probas[i] = proba
+            prediction_cache.put(keys[i], features=f, proba=proba)
+
+    failed = set(pending) - {i for i, _ in scored}
+    rows = [i for i, p in enumerate(probas) if p is not None]
+    decoded = dict(zip(rows, decode_predictions(
+        np.vstack([probas[i] for i in rows])
+    ))) if rows else {}
+
+    # None marks clips too short to extract features from
+    return [
+        None if i in failed else decoded.get(i) or decode_prediction(None)
+        for i in range(len(signals))
     ]
 
-    return emotion, round(confidence, 2), top_predictions
+
+def score_stream_updates(updates):
+    """Turn streaming window updates into timeline points"""
+    # Same energy gate as score_audio, applied to the window's frame RMS
+    live = [i for i, (_, _, rms) in enumerate(updates) if rms >= 0.01]
+    GATED.inc(len(updates) - len(live))
+    decoded = {}
+    if live:
+        X = np.vstack([updates[i][1] for i in live])
+        decoded = dict(zip(live, decode_predictions(model_proba(X))))
+
+    points = []
+    for i, (t, _, _) in enumerate(updates):
+        emotion, confidence, _ = decoded.get(i) or decode_prediction(None)
+        points.append({
+            "t": t,
+            "emotion": emotion,
+            "confidence": confidence,
+            "emoji": get_emotion_emoji(emotion),
+            "gated": i not in decoded
+        })
+    return points
+
+
+def _expire_stream_sessions():
+    now = time.monotonic()
+    with stream_lock:
+        for sid in [s for s, v in stream_sessions.items()
+                    if now - v["seen"] > STREAM_IDLE_TIMEOUT]:
+            del stream_sessions[sid]
+
+
+def _get_stream_session(sid):
+    with stream_lock:
+        session = stream_sessions.get(sid)
+        if session is not None:
+            session["seen"] = time.monotonic()
+    return session
+
+
+def analyze_long_audio(path):
+    """Per-segment emotion timeline and summary for a long recording.
+
+    The file is decoded block by block and split into voiced segments;
+    segments are scored in waves through predict_batch, so extraction runs
+    on the worker pool and memory stays bounded by one wave.
+    """
+    segmenter = EnergySegmenter(
+        16000, min_segment=SEGMENT_MIN_SECONDS, max_segment=SEGMENT_MAX_SECONDS
+    )
+    wave_size = max(4, EXTRACT_WORKERS * 4)
+    timeline, wave = [], []
+    duration = 0.0
+
+    def score(segments):
+        for (start, end, _), prediction in zip(
+            segments, predict_batch([y for _, _, y in segments])
+        ):
+            if prediction is None:
+                continue
+            emotion, confidence, top_predictions = prediction
+            timeline.append({
+                "start": start,
+                "end": end,
+                "emotion": emotion,
+                "confidence": confidence,
+                "emoji": get_emotion_emoji(emotion),
+                "top_predictions": top_predictions
+            })
+
+    with STAGE_SECONDS.time(stage="long_audio"):
+        for block in iter_audio_blocks(path, block_seconds=LONG_BLOCK_SECONDS):
+            duration += len(block) / 16000
+            wave.extend(segmenter.push(block))
+            if len(wave) >= wave_size:
+                score(wave)
+                wave = []
+        wave.extend(segmenter.flush())
+        if wave:
+            score(wave)
+
+    return timeline, summarize_timeline(timeline, duration)
+
+
+def _resolve_batch_path(path):
+    full = os.path.abspath(os.path.join(BATCH_ROOT, path))
+    if os.path.commonpath([full, BATCH_ROOT]) != BATCH_ROOT:
+        raise ValueError("path outside batch root")
+    if not os.path.isfile(full):
+        raise ValueError("file not found")
+    return full
 
 # -------------------------
 # Routes
 # -------------------------
 @app.route("/")
 def index():
-    return render_template("index.html", model_metrics=model_metrics)
+    return render_template("index.html", model_metrics=artifacts.metrics)
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route("/metrics")
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/transcript/<job_id>")
+def transcript_status(job_id):
+    # ?wait=N long-polls until the job finishes or N seconds pass
+    wait = min(float(request.args.get("wait", 0)), 30)
+    return jsonify(transcriber.status(job_id, wait=wait))
+
+@app.route("/temp/<workspace_id>/<filename>")
+def temp_file(workspace_id, filename):
+    return send_from_directory(TEMP_DIR, f"{workspace_id}/{filename}")
+
+# -------- Profiles (admin) --------
+def _profiling_token():
+    return request.headers.get(PROFILE_HEADER) or request.args.get("token")
 
-@app.route("/temp/<filename>")
-def temp_file(filename):
-    return send_from_directory(TEMP_DIR, filename)
+
+@app.route("/profiles")
+def profiles_index():
+    token = _profiling_token()
+    if not profiler.is_admin(token):
+        return "Not found", 404
+    return render_template("profiles.html", profiles=profiler.list(), token=token)
+
+
+@app.route("/profiles/<profile_id>.<ext>")
+def profile_file(profile_id, ext):
+    if not profiler.is_admin(_profiling_token()) or ext not in ("folded", "json"):
+        return "Not found", 404
+    return send_from_directory(
+        PROFILING_DIR, f"{profile_id}.{ext}", mimetype="text/plain", as_attachment=ext == "folded"
+    )
 
 # -------- Upload audio --------
 @app.route("/predict", methods=["POST"])
+@instrument("predict")
+@profiler.profiled("predict")
 def predict():
     file = request.files.get("audio")
     if not file:
         return "No file uploaded", 400
 
-    filename = secure_filename(file.filename)
-    raw_path = os.path.join(TEMP_DIR, filename)
-    file.save(raw_path)
+    with temp_store.workspace() as ws:
+        raw_path = ws.file(file.filename)
+        file.save(raw_path)
+
+        # Decode once; every stage below works on the same array
+        with STAGE_SECONDS.time(stage="decode"):
+            y = decode_audio(raw_path, quality=RESAMPLE_QUALITY)
+        annotate(audio_seconds=round(len(y) / 16000, 3), filename=file.filename)
 
-    wav_path = os.path.splitext(raw_path)[0] + ".wav"
-    AudioSegment.from_file(raw_path).set_channels(1).set_frame_rate(
-        16000
-    ).export(wav_path, format="wav")
+        # The key lets /feedback find the scored features again
+        sample_key = prediction_cache.key_for(y)
+        # Transcription overlaps with scoring and never delays the result
+        transcript_job = start_transcription(y, key=sample_key)
+        try:
+            emotion, confidence, top_predictions = predict_emotion(y, sample_key)
+        except ClipTooShort:
+            return "Clip too short: record at least half a second of speech", 400
 
-    emotion, confidence, top_predictions = predict_emotion(wav_path)
-    transcript = transcribe_audio(wav_path)
+        # The result page plays the clip back, so only now write a WAV
+        with STAGE_SECONDS.time(stage="write_wav"):
+            wav_path = write_wav(os.path.splitext(raw_path)[0] + ".wav", y)
 
     return render_template(
         "result.html",
@@ -150,29 +702,104 @@ def predict():
         confidence_color=get_confidence_color(confidence),
         emotion_emoji=get_emotion_emoji(emotion),
         top_predictions=top_predictions,
-        audio_file=f"/temp/{os.path.basename(wav_path)}",
-        transcript=transcript,
-        model_metrics=model_metrics
+        audio_file=ws.url(wav_path),
+        transcript=transcriber.status(transcript_job)["transcript"],
+        transcript_job=transcript_job,
+        sample_key=sample_key,
+        model_metrics=artifacts.metrics
     )
 
 # -------- LIVE MIC --------
 @app.route("/predict_live", methods=["POST"])
+@instrument("predict_live")
+@profiler.profiled("predict_live")
 def predict_live():
     file = request.files.get("audio")
     if not file:
         return "No audio received", 400
 
-    webm_path = os.path.join(STATIC_RECORDINGS_DIR, "recorded_audio.webm")
-    file.save(webm_path)
+    with recordings_store.workspace() as ws:
+        webm_path = ws.file("recorded_audio.webm")
+        file.save(webm_path)
 
-    wav_path = webm_path.replace(".webm", ".wav")
-    AudioSegment.from_file(webm_path).set_channels(1).set_frame_rate(
-        16000
-    ).export(wav_path, format="wav")
+        with STAGE_SECONDS.time(stage="decode"):
+            y = decode_audio(webm_path, quality=LIVE_RESAMPLE_QUALITY)
+        annotate(audio_seconds=round(len(y) / 16000, 3))
 
-    emotion, confidence, top_predictions = predict_emotion(wav_path)
-    transcript = transcribe_audio(wav_path)
+        # The key lets /feedback find the scored features again
+        sample_key = prediction_cache.key_for(y)
+        # Transcription overlaps with scoring and never delays the result
+        transcript_job = start_transcription(y, key=sample_key)
+        try:
+            emotion, confidence, top_predictions = predict_emotion(y, sample_key)
+        except ClipTooShort:
+            return "Clip too short: record at least half a second of speech", 400
+
+        with STAGE_SECONDS.time(stage="write_wav"):
+            wav_path = write_wav(webm_path.replace(".webm", ".wav"), y)
+
+    return render_template(
+        "result.html",
+        emotion=emotion,
+        confidence=confidence,
+        confidence_color=get_confidence_color(confidence),
+        emotion_emoji=get_emotion_emoji(emotion),
+        top_predictions=top_predictions,
+        audio_file=ws.url(wav_path),
+        transcript=transcriber.status(transcript_job)["transcript"],
+        transcript_job=transcript_job,
+        sample_key=sample_key,
+        model_metrics=artifacts.metrics
+    )
+
+# -------- Feedback --------
+@app.route("/feedback", methods=["POST"])
+def feedback():
+    emotion = request.form.get("emotion", "")
+    confidence = request.form.get("confidence", "")
+    verdict = request.form.get("user_feedback", "")
+    comment = " ".join(request.form.get("custom_feedback", "").split())
+
+    with feedback_lock:
+        with open(FEEDBACK_LOG, "a") as f:
+            f.write(f"{emotion},{confidence},{verdict}, {comment}\n\n")
+
+    # A correction wins; "yes" confirms the predicted label
+    label = request.form.get("correct_emotion") or (emotion if verdict == "yes" else None)
+    sample = request.form.get("sample")
+    if label in artifacts.encoder.classes_ and sample:
+        entry = prediction_cache.peek(sample)
+        if entry is not None and entry.get("features") is not None:
+            feedback_store.add(entry["features"], label, extractor.version, predicted=emotion)
+
+    return render_template("feedback.html")
+
+# -------- Long recordings --------
+@app.route("/predict_long", methods=["POST"])
+@instrument("predict_long")
+def predict_long():
+    file = request.files.get("audio")
+    if not file:
+        return "No file uploaded", 400
+
+    with temp_store.workspace() as ws:
+        raw_path = ws.file(file.filename)
+        file.save(raw_path)
+
+        try:
+            timeline, summary = analyze_long_audio(raw_path)
+        except (RuntimeError, OSError) as e:
+            print("Long audio decode error:", e)
+            return "Could not decode audio", 400
+
+    emotion = summary["dominant_emotion"] or "neutral"
+    confidence = summary["dominant_confidence"] if timeline else 40.0
+    top_predictions = [
+        {"emotion": e, "confidence": share, "emoji": get_emotion_emoji(e)}
+        for e, share in list(summary["emotion_share"].items())[:3]
+    ]
 
+    # The upload itself is played back; no full decode is kept in memory
     return render_template(
         "result.html",
         emotion=emotion,
@@ -180,11 +807,247 @@ def predict_live():
         confidence_color=get_confidence_color(confidence),
         emotion_emoji=get_emotion_emoji(emotion),
         top_predictions=top_predictions,
-        audio_file=f"/static/recordings/{os.path.basename(wav_path)}",
-        transcript=transcript,
-        model_metrics=model_metrics
+        audio_file=ws.url(raw_path),
+        timeline=timeline,
+        summary=summary,
+        model_metrics=artifacts.metrics
     )
 
+@app.route("/api/predict_long", methods=["POST"])
+@instrument("predict_long_api")
+def api_predict_long():
+    file = request.files.get("audio")
+    payload = request.get_json(silent=True) or {}
+
+    if not file and not payload.get("path"):
+        return jsonify({"error": "send an 'audio' file or a JSON 'path'"}), 400
+
+    # Nothing is played back, so the upload is deleted with the request
+    with temp_store.workspace(keep=False) as ws:
+        if file:
+            name = file.filename
+            path = ws.file(name)
+            file.save(path)
+        else:
+            name = payload["path"]
+            try:
+                path = _resolve_batch_path(name)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        try:
+            timeline, summary = analyze_long_audio(path)
+        except (RuntimeError, OSError) as e:
+            return jsonify({"error": f"could not decode audio: {e}"}), 400
+
+    return jsonify({"name": name, "summary": summary, "timeline": timeline})
+
+# -------- Batch JSON API --------
+@app.route("/api/predict_batch", methods=["POST"])
+@instrument("predict_batch")
+def api_predict_batch():
+    uploads = request.files.getlist("audio")
+    payload = request.get_json(silent=True) or {}
+    paths = payload.get("paths") or []
+    transcribe = str(
+        payload.get("transcribe", request.form.get("transcribe", ""))
+    ).lower() in ("1", "true", "yes")
+
+    if not uploads and not paths:
+        return jsonify({"error": "send 'audio' files or a JSON 'paths' list"}), 400
+    if len(uploads) + len(paths) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"at most {BATCH_MAX_ITEMS} items per batch"}), 413
+
+    sources = [(f.filename, f) for f in uploads]
+    for path in paths:
+        try:
+            sources.append((path, _resolve_batch_path(path)))
+        except ValueError as e:
+            sources.append((path, e))
+
+    def decode(source):
+        if isinstance(source, Exception):
+            return None
+        try:
+            with STAGE_SECONDS.time(stage="decode"):
+                return decode_audio(source, quality=RESAMPLE_QUALITY)
+        except Exception as e:
+            print("Batch decode error:", e)
+            return None
+
+    # Decoding is ffmpeg/IO bound, so threads are enough here
+    with ThreadPoolExecutor(max_workers=min(8, len(sources))) as pool:
+        signals = list(pool.map(decode, [src for _, src in sources]))
+
+    ok = [i for i, y in enumerate(signals) if y is not None]
+    # Hashed once; the same keys serve scoring and transcription
+    keys = {i: prediction_cache.key_for(signals[i]) for i in ok}
+    predictions = dict(zip(ok, predict_batch(
+        [signals[i] for i in ok], [keys[i] for i in ok]
+    ))) if ok else {}
+
+    results = []
+    for i, (name, source) in enumerate(sources):
+        prediction = predictions.get(i)
+        if isinstance(source, Exception):
+            results.append({"name": name, "error": str(source)})
+        elif signals[i] is None:
+            results.append({"name": name, "error": "could not decode audio"})
+        elif prediction is None:
+            results.append({"name": name, "error": "clip too short for feature extraction"})
+        else:
+            emotion, confidence, top_predictions = prediction
+            result = {
+                "name": name,
+                "emotion": emotion,
+                "confidence": confidence,
+                "top_predictions": top_predictions
+            }
+            if transcribe:
+                result["transcript_job"] = start_transcription(signals[i], key=keys[i])
+            results.append(result)
+
+    return jsonify({"count": len(results), "results": results})
+
+# -------- Streaming live mic --------
+# Chunked HTTP: the browser posts raw 16 kHz int16 PCM every few hundred ms
+@app.route("/stream/start", methods=["POST"])
+def stream_start():
+    # Imported on first use: it pulls in scipy.signal/ndimage, which would
+    # otherwise dominate start-up time
+    from src.features.streaming import StreamingFeatureExtractor
+
+    _expire_stream_sessions()
+    with stream_lock:
+        if len(stream_sessions) >= STREAM_MAX_SESSIONS:
+            return jsonify({"error": "too many live sessions"}), 503
+        sid = uuid.uuid4().hex
+        stream_sessions[sid] = {
+            "extractor": StreamingFeatureExtractor(
+                16000, window_seconds=STREAM_WINDOW, update_seconds=STREAM_UPDATE,
+                groups=FEATURE_GROUPS
+            ),
+            "lock": threading.Lock(),
+            "seen": time.monotonic()
+        }
+
+    return jsonify({
+        "session": sid,
+        "sample_rate": 16000,
+        "window_seconds": STREAM_WINDOW,
+        "update_seconds": STREAM_UPDATE
+    })
+
+@app.route("/stream/<sid>/chunk", methods=["POST"])
+@instrument("stream_chunk")
+def stream_chunk(sid):
+    session = _get_stream_session(sid)
+    if session is None:
+        return jsonify({"error": "unknown or expired session"}), 404
+
+    data = request.get_data()
+    samples = np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+    with session["lock"], STAGE_SECONDS.time(stage="stream_features"):
+        updates = session["extractor"].push(samples.astype(np.float32) / 32768.0)
+
+    return jsonify({"timeline": score_stream_updates(updates)})
+
+@app.route("/stream/<sid>/stop", methods=["POST"])
+def stream_stop(sid):
+    with stream_lock:
+        session = stream_sessions.pop(sid, None)
+    if session is None:
+        return jsonify({"error": "unknown or expired session"}), 404
+
+    with session["lock"]:
+        updates = session["extractor"].flush()
+
+    return jsonify({"timeline": score_stream_updates(updates)})
+
+# -------------------------
+# Start-up
+# -------------------------
+def warm_up():
+    """Run a synthetic voiced clip through predict_emotion.
+
+    The first call pays librosa/numba compilation and filter-bank
+    construction; doing it here keeps that cost off the first request.
+    Returns (first call, warm call) latency in seconds.
+    """
+    t = np.arange(2 * 16000) / 16000
+    y = (0.1 * np.sin(2 * np.pi * 180 * t) * (1 + np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+
+    # Start every extraction worker; each one warms itself up on start
+    pool = get_extraction_pool()
+    if pool is not None:
+        for job in [pool.submit(extract_array, y) for _ in range(EXTRACT_WORKERS)]:
+            job.result()
+
+    start = time.perf_counter()
+    predict_emotion(y)
+    first = time.perf_counter() - start
+
+    # A different clip, so the second call is not a cache hit
+    start = time.perf_counter()
+    predict_emotion(y * 0.9)
+    warm = time.perf_counter() - start
+
+    # Warm-up traffic should not show up in request metrics
+    reset_metrics()
+    return first, warm
+
+
+def report_startup():
+    phases = {
+        "imports": _imports_done - _startup_begin,
+        "model_load": _artifacts_done - _imports_done
+    }
+    line = (f"Startup: imports {phases['imports']:.2f}s, "
+            f"model load {phases['model_load']:.2f}s")
+
+    if WARMUP:
+        first, warm = warm_up()
+        phases["warmup"] = first + warm
+        line += (f", warm-up {phases['warmup']:.2f}s "
+                 f"(first request {first * 1000:.0f} ms, warm {warm * 1000:.0f} ms)")
+
+    phases["total"] = time.perf_counter() - _startup_begin
+    for phase, seconds in phases.items():
+        STARTUP_SECONDS.set(round(seconds, 4), phase=phase)
+    print(line + f", ready in {phases['total']:.2f}s")
+
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def create_app():
+    """Start the workspace janitor, the micro-batcher, the extraction pool
+    and the warm-up once, and return the Flask app.
+
+    Importing this module does none of that, so scripts that import it
+    stay cheap. WSGI servers should load ``app:create_app()``.
+    """
+    global _started
+    with _start_lock:
+        if not _started:
+            janitor.start()
+            if inference_batcher is not None:
+                inference_batcher.start()
+            report_startup()
+            _started = True
+    return app
+
+
 # -------------------------
 if __name__ == "__main__":
-    app.run(debug=True)
+    debug = os.environ.get("SER_DEBUG", "1").lower() not in ("0", "false", "no")
+    # With the reloader, only the child process serves requests
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        create_app()
+    app.run(
+        host=os.environ.get("SER_HOST", "127.0.0.1"),
+        port=int(os.environ.get("SER_PORT", 5000)),
+        debug=debug,
+        threaded=True
+    )
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Per-Stage Benchmark for the SER Prediction Pipeline
+Times every stage of a prediction on deterministic synthetic audio, saves
+JSON baselines and fails when a stage regresses past a threshold
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import soundfile as sf
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Transcription is stubbed so the suite never touches the network; the
+# suite runs its own warm-up per clip length
+os.environ["SER_TRANSCRIBER"] = "static"
+os.environ.setdefault("SER_WARMUP", "0")
+
+DEFAULT_LENGTHS = [1, 5, 30, 300]
+# Stages renamed since older baselines were saved: old name -> current name
+STAGE_ALIASES = {"decode_pydub": "decode"}
+SOURCE_RATE = 44100
+
+
+def synth_audio(seconds, sr=SOURCE_RATE, seed=0):
+    """Deterministic speech-like stereo signal: voiced tones, noise, pauses"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+
+    # Gliding fundamental with a few harmonics, like a voice
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t) + 10 * np.sin(2 * np.pi * 5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+
+    # Syllable-rate envelope with silent gaps
+    envelope = np.clip(np.sin(2 * np.pi * 2.5 * t), 0, None) ** 0.5
+    envelope *= (np.sin(2 * np.pi * 0.2 * t) > -0.7)
+    noise = rng.standard_normal(n) * 0.02
+
+    mono = 0.3 * voice * envelope + noise
+    stereo = np.column_stack([mono, 0.9 * mono]).astype(np.float32)
+    return np.clip(stereo, -1, 1)
+
+
+class StageTimer:
+    """Collects wall time, and optionally peak traced memory, per stage"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.times = {}
+        self.peaks = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        self.times.setdefault(name, []).append(time.perf_counter() - start)
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - base
+            self.peaks[name] = max(self.peaks.get(name, 0), peak)
+
+
+def write_clips(tmp, seconds):
+    """The synthetic clip as a WAV upload and as a live-mic WebM recording"""
+    wav_path = os.path.join(tmp, f"synthetic_{seconds}s.wav")
+    sf.write(wav_path, synth_audio(seconds), SOURCE_RATE, subtype="PCM_16")
+    # What MediaRecorder sends: 48 kHz Opus in WebM, decoded through ffmpeg
+    webm_path = os.path.join(tmp, f"synthetic_{seconds}s.webm")
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-i", wav_path, "-ar", "48000",
+         "-c:a", "libopus", webm_path],
+        check=True
+    )
+    return wav_path, webm_path
+
+
+def run_pipeline(app, paths, timer):
+    """One prediction, split into the stages the app runs"""
+    from src.features.audio_features import HPSS_GROUPS, SignalAnalysis
+    from src.utils.audio_io import decode_audio
+    import librosa
+
+    wav_path, webm_path = paths
+    # Uploads take the in-process soundfile path, live recordings ffmpeg;
+    # the stages below work on the upload
+    with timer.stage("decode"):
+        y = decode_audio(wav_path, quality=app.RESAMPLE_QUALITY)
+    with timer.stage("decode_ffmpeg"):
+        decode_audio(webm_path, quality=app.LIVE_RESAMPLE_QUALITY)
+    with timer.stage("rms_gate"):
+        np.mean(librosa.feature.rms(y=y))
+
+    # Shared intermediates are timed on their own so each feature group
+    # only shows its own work
+    analysis = SignalAnalysis(y, 16000)
+    with timer.stage("stft"):
+        analysis.power
+    if any(g in app.extractor.groups for g in HPSS_GROUPS):
+        with timer.stage("hpss"):
+            analysis.hpss
+
+    groups = []
+    for group in app.extractor.groups:
+        with timer.stage(f"feature_{group}"):
+            groups.append(np.ravel(getattr(app.extractor, "_" + group)(analysis)))
+    features = np.hstack(groups).astype(np.float32).reshape(1, -1)
+
+    # With SER_INFERENCE_BACKEND=compiled the app never loads the estimator
+    artifacts = app.artifacts
+    if artifacts.model is not None:
+        with timer.stage("scaler_transform"):
+            scaled = artifacts.scaler.transform(features)
+        with timer.stage("predict_proba"):
+            proba = artifacts.model.predict_proba(scaled)
+    if artifacts.compiled is not None:
+        with timer.stage("predict_proba_compiled"):
+            proba = artifacts.compiled.predict_proba(features)
+    with timer.stage("result_assembly"):
+        app.decode_predictions(proba)
+    with timer.stage("transcription_submit"):
+        app.transcriber.submit(y)
+
+
+def summarize(times, peaks):
+    results = {}
+    for name, samples in times.items():
+        ms = np.array(samples) * 1000
+        results[name] = {
+            "n": len(ms),
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "peak_kb": round(peaks.get(name, 0) / 1024, 1)
+        }
+    return results
+
+
+def benchmark(lengths, repeats, audio_budget):
+    import app
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for seconds in lengths:
+            paths = write_clips(tmp, seconds)
+
+            # Long clips run fewer times so the suite stays bounded
+            n = max(1, min(repeats, int(audio_budget // seconds)))
+            timer = StageTimer()
+            run_pipeline(app, paths, StageTimer())  # warm-up
+            for _ in range(n):
+                run_pipeline(app, paths, timer)
+
+            # Memory in a separate pass: tracing would distort the timings
+            memory = StageTimer(trace_memory=True)
+            tracemalloc.start()
+            run_pipeline(app, paths, memory)
+            tracemalloc.stop()
+
+            report[f"{seconds}s"] = summarize(timer.times, memory.peaks)
+            total = sum(s["p50_ms"] for s in report[f"{seconds}s"].values())
+            print(f"⏱️  {seconds}s clip: {total:.1f} ms per prediction (p50 sum, n={n})")
+
+    app.transcriber.shutdown()
+    return report
+
+
+def print_report(report):
+    for length, stages in report.items():
+        print(f"\n📊 {length}")
+        print(f"{'stage':26}{'mean':>10}{'p50':>10}{'p99':>10}{'peak KiB':>12}")
+        for name, s in stages.items():
+            print(f"{name:26}{s['mean_ms']:10.2f}{s['p50_ms']:10.2f}"
+                  f"{s['p99_ms']:10.2f}{s['peak_kb']:12.1f}")
+
+
+def load_baseline(path):
+    """A saved baseline, with renamed stages mapped to their current names"""
+    with open(path) as f:
+        baseline = json.load(f)
+    return {
+        length: {STAGE_ALIASES.get(name, name): s for name, s in stages.items()}
+        for length, stages in baseline.items()
+    }
+
+
+def find_regressions(report, baseline, threshold, min_delta_ms):
+    """Stages whose p50 grew by more than threshold (and min_delta_ms)"""
+    regressions = []
+    for length, stages in report.items():
+        for name, s in stages.items():
+            old = baseline.get(length, {}).get(name)
+            if old is None:
+                continue
+            delta = s["p50_ms"] - old["p50_ms"]
+            if delta > min_delta_ms and s["p50_ms"] > old["p50_ms"] * (1 + threshold):
+                regressions.append((length, name, old["p50_ms"], s["p50_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lengths", type=float, nargs="+", default=DEFAULT_LENGTHS,
+                        help="clip lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="timed runs per clip length")
+    parser.add_argument("--audio-budget", type=float, default=60,
+                        help="max seconds of audio processed per length")
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed relative p50 slowdown per stage")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    lengths = [int(s) if float(s).is_integer() else s for s in args.lengths]
+    report = benchmark(lengths, args.repeats, args.audio_budget)
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save}")
+
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        regressions = find_regressions(
+            report, baseline, args.threshold, args.min_delta_ms
+        )
+        if regressions:
+            print("\n❌ Regressions:")
+            for length, name, old, new in regressions:
+                print(f"  {length} {name}: {old:.2f} ms -> {new:.2f} ms")
+            return 1
+        print("\n✅ No stage regressed past the threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
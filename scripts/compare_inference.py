@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Inference Backend Comparison for SER Project
+Checks that the compiled forest matches sklearn exactly and compares
+latency and memory of the two backends
+"""
+
+import os
+import sys
+import time
+import pickle
+import joblib
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.models.forest_engine import load_or_compile
+
+MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+
+
+def timed(fn, repeats):
+    """Median wall time of fn in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+
+def main(n_rows=256, repeats=50):
+    model_path = os.path.join(MODELS_DIR, "model.pkl")
+    scaler_path = os.path.join(MODELS_DIR, "scaler.pkl")
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    compiled = load_or_compile(model_path, scaler_path)
+
+    # Random rows around the training distribution reach every kind of leaf
+    rng = np.random.default_rng(0)
+    X = (rng.standard_normal((n_rows, scaler.n_features_in_)) * scaler.scale_
+         + scaler.mean_).astype(np.float32)
+
+    exact = np.array_equal(
+        model.predict_proba(scaler.transform(X)), compiled.predict_proba(X)
+    )
+    print("✅ Probabilities match sklearn exactly" if exact
+          else "❌ Probabilities differ from sklearn")
+
+    print(f"\n📦 Pickled estimator: {len(pickle.dumps(model)) / 1024:.0f} KiB")
+    print(f"📦 Compiled arrays:   {compiled.nbytes / 1024:.0f} KiB")
+
+    row = X[:1]
+    print(f"\n⏱️  Median latency over {repeats} calls")
+    print(f"{'':12}{'sklearn':>12}{'compiled':>12}")
+    for name, rows in (("1 row", row), (f"{n_rows} rows", X)):
+        sk = timed(lambda: model.predict_proba(scaler.transform(rows)), repeats)
+        cf = timed(lambda: compiled.predict_proba(rows), repeats)
+        print(f"{name:12}{sk:10.2f}ms{cf:10.2f}ms  ({sk / cf:.0f}x)")
+
+    return exact
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
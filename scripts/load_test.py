@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Load Test for the SER Web Endpoints
+Starts app.py locally with transcription stubbed, drives /predict and
+/predict_live with synthetic WAV/WebM clips at increasing concurrency and
+reports throughput, latency percentiles, errors and server RSS per step
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import SOURCE_RATE, synth_audio
+
+ENDPOINTS = {
+    # endpoint: (form filename, content type, clip format)
+    "predict": ("clip.wav", "audio/wav", "wav"),
+    "predict_live": ("recorded_audio.webm", "audio/webm", "webm")
+}
+
+# Server settings for a load test; --env overrides any of them
+SERVER_ENV = {
+    "SER_TRANSCRIBER": "static",
+    "SER_DEBUG": "0",
+    # Every request is a cache miss, as with real uploads
+    "SER_CACHE_SIZE": "0",
+    # Playback files are dropped soon after each request. Servers share
+    # temp/, but a janitor skips workspaces locked by any of them
+    "SER_WORKSPACE_TTL": "10",
+    "SER_JANITOR_INTERVAL": "10"
+}
+
+
+# -------------------------
+# Clips
+# -------------------------
+def make_clips(tmp, seconds, count, formats):
+    """``count`` distinct synthetic clips per format, as raw bytes"""
+    clips = {fmt: [] for fmt in formats}
+    for i in range(count):
+        wav_path = os.path.join(tmp, f"clip_{i}.wav")
+        sf.write(wav_path, synth_audio(seconds, seed=i), SOURCE_RATE, subtype="PCM_16")
+        if "wav" in clips:
+            with open(wav_path, "rb") as f:
+                clips["wav"].append(f.read())
+        if "webm" in clips:
+            # What MediaRecorder sends: 48 kHz Opus in WebM
+            webm_path = os.path.join(tmp, f"clip_{i}.webm")
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-y", "-i", wav_path, "-ar", "48000",
+                 "-c:a", "libopus", webm_path],
+                check=True
+            )
+            with open(webm_path, "rb") as f:
+                clips["webm"].append(f.read())
+    return clips
+
+
+def multipart(field, filename, content_type, payload):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# -------------------------
+# Servers
+# -------------------------
+class Server:
+    """One app.py process on its own port"""
+
+    def __init__(self, port, env, log_dir):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.log_path = os.path.join(log_dir, f"server_{port}.log")
+        self.log = open(self.log_path, "w")
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.join(PROJECT_ROOT, "app.py")],
+            cwd=PROJECT_ROOT, env={**os.environ, **env, "SER_PORT": str(port)},
+            stdout=self.log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(self.url + "/", timeout=2):
+                    return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.5)
+        self.stop()
+        with open(self.log_path) as f:
+            tail = f.read()[-2000:]
+        raise SystemExit(f"❌ Server on port {self.port} did not start:\n{tail}")
+
+    def rss_bytes(self):
+        """RSS of the server and its children (e.g. extraction workers)"""
+        return sum(_rss(pid) for pid in _process_tree(self.proc.pid))
+
+    def stop(self):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+        self.log.close()
+
+
+def _process_tree(root):
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # The command name may hold spaces; fields after it are fixed
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def _rss(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+# -------------------------
+# Load steps
+# -------------------------
+def run_step(urls, endpoint, clips, concurrency, duration, servers=None):
+    """Closed loop: ``concurrency`` clients send requests back to back"""
+    filename, content_type, fmt = ENDPOINTS[endpoint]
+    latencies, errors = [], {}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(index)
+        n = index
+        while time.perf_counter() < stop_at:
+            url = urls[n % len(urls)] + "/" + endpoint
+            n += concurrency
+            body, ctype = multipart("audio", filename, content_type, rng.choice(clips[fmt]))
+            req = urllib.request.Request(url, data=body, headers={"Content-Type": ctype})
+            start = time.perf_counter()
+            error = None
+            try:
+                with urllib.request.urlopen(req, timeout=120) as resp:
+                    resp.read()
+            except urllib.error.HTTPError as e:
+                error = f"http {e.code}"
+            except Exception as e:
+                error = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+    rss_peak = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(client, i) for i in range(concurrency)]
+        while not all(f.done() for f in futures):
+            if servers:
+                rss_peak = max(rss_peak, sum(s.rss_bytes() for s in servers))
+            time.sleep(0.2)
+        for f in futures:
+            f.result()
+    wall = time.perf_counter() - start
+
+    n_errors = sum(errors.values())
+    total = len(latencies) + n_errors
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "errors": errors,
+        "error_rate": round(n_errors / total, 4) if total else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 3),
+        "mean_ms": round(float(ms.mean()), 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "rss_mb_peak": round(rss_peak / (1 << 20), 1) if servers else None,
+        "rss_mb_end": round(sum(s.rss_bytes() for s in servers) / (1 << 20), 1) if servers else None
+    }
+
+
+def print_step(step, base_rps):
+    scale = step["throughput_rps"] / base_rps if base_rps else 0.0
+    rss = f"{step['rss_mb_peak']:8.0f}" if step["rss_mb_peak"] is not None else f"{'-':>8}"
+    print(f"{step['endpoint']:14}{step['concurrency']:>5}{step['throughput_rps']:9.2f}"
+          f"{scale:7.2f}x{step['p50_ms']:9.0f}{step['p95_ms']:9.0f}{step['p99_ms']:9.0f}"
+          f"{step['error_rate'] * 100:7.1f}%{rss}")
+
+
+def saturation_points(steps, share=0.9):
+    """Per endpoint, the lowest concurrency reaching ``share`` of peak throughput"""
+    points = {}
+    by_endpoint = {}
+    for step in steps:
+        by_endpoint.setdefault(step["endpoint"], []).append(step)
+    for endpoint, series in by_endpoint.items():
+        peak = max(s["throughput_rps"] for s in series)
+        knee = next(s for s in series if s["throughput_rps"] >= share * peak)
+        points[endpoint] = {"concurrency": knee["concurrency"], "peak_rps": peak}
+    return points
+
+
+def compare(report, baseline):
+    print(f"\n🔁 Compared with {baseline['meta'].get('label') or 'baseline'}")
+    print(f"{'endpoint':14}{'conc':>5}{'rps old':>9}{'rps new':>9}{'p95 old':>9}{'p95 new':>9}")
+    old = {(s["endpoint"], s["concurrency"]): s for s in baseline["steps"]}
+    for step in report["steps"]:
+        prev = old.get((step["endpoint"], step["concurrency"]))
+        if prev is None:
+            continue
+        print(f"{step['endpoint']:14}{step['concurrency']:>5}{prev['throughput_rps']:9.2f}"
+              f"{step['throughput_rps']:9.2f}{prev['p95_ms']:9.0f}{step['p95_ms']:9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="concurrent clients per step")
+    parser.add_argument("--duration", type=float, default=15,
+                        help="seconds per step")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS),
+                        default=["predict", "predict_live"])
+    parser.add_argument("--clip-seconds", type=float, default=3,
+                        help="length of the synthetic clips")
+    parser.add_argument("--clips", type=int, default=8,
+                        help="distinct clips per format")
+    parser.add_argument("--servers", type=int, default=1,
+                        help="app.py processes, load-balanced round robin by the client")
+    parser.add_argument("--port", type=int, default=5100,
+                        help="first server port")
+    parser.add_argument("--url", nargs="+",
+                        help="test running servers instead of starting them (no RSS)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra server environment, e.g. SER_FEATURE_PROFILE=fast")
+    parser.add_argument("--startup-timeout", type=float, default=180)
+    parser.add_argument("--label", help="name stored with the results")
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--compare", help="compare against saved results")
+    args = parser.parse_args()
+
+    env = dict(SERVER_ENV)
+    env.update(kv.split("=", 1) for kv in args.env)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        formats = {ENDPOINTS[e][2] for e in args.endpoints}
+        print(f"🎵 Generating {args.clips} x {args.clip_seconds:g}s clips ({', '.join(sorted(formats))})")
+        clips = make_clips(tmp, args.clip_seconds, args.clips, formats)
+
+        servers = []
+        try:
+            if args.url:
+                urls = [u.rstrip("/") for u in args.url]
+            else:
+                for i in range(args.servers):
+                    servers.append(Server(args.port + i, env, tmp))
+                for server in servers:
+                    server.wait_ready(args.startup_timeout)
+                urls = [s.url for s in servers]
+                print(f"🚀 {len(servers)} server(s) ready, idle RSS "
+                      f"{sum(s.rss_bytes() for s in servers) / (1 << 20):.0f} MB")
+
+            print(f"\n{'endpoint':14}{'conc':>5}{'rps':>9}{'scale':>8}{'p50':>9}{'p95':>9}"
+                  f"{'p99':>9}{'errors':>8}{'RSS MB':>8}")
+            steps = []
+            for endpoint in args.endpoints:
+                # One untimed request per server loads lazy paths first
+                run_step(urls, endpoint, clips, len(urls), 0.01)
+                base_rps = None
+                for concurrency in args.concurrency:
+                    step = run_step(urls, endpoint, clips, concurrency, args.duration, servers)
+                    base_rps = base_rps or step["throughput_rps"]
+                    print_step(step, base_rps)
+                    steps.append(step)
+        finally:
+            for server in servers:
+                server.stop()
+
+    saturation = saturation_points(steps)
+    for endpoint, point in saturation.items():
+        print(f"📈 {endpoint}: 90% of peak throughput ({point['peak_rps']:.2f} rps) "
+              f"at {point['concurrency']} concurrent clients")
+
+    report = {
+        "meta": {
+            "label": args.label,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "servers": len(urls),
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "clip_seconds": args.clip_seconds,
+            "duration": args.duration,
+            "env": env if not args.url else None
+        },
+        "steps": steps,
+        "saturation": saturation
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Offline Bulk Scoring for SER Project
+Scores every audio file in a directory or CSV/JSONL manifest with the
+trained artifacts, streaming results to CSV/JSONL with resumable checkpoints
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.features.audio_features import FEATURE_PROFILES
+from src.features.parallel import (
+    decode_and_extract_batch, default_workers, init_worker, parallel_map_chunks
+)
+from src.models.forest_engine import load_or_compile
+
+MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+AUDIO_EXTENSIONS = (
+    ".wav", ".flac", ".ogg", ".aiff", ".aif", ".mp3", ".m4a", ".webm"
+)
+# Same threshold the web app uses to report "uncertain"
+UNCERTAIN_BELOW = 35
+
+
+# -------------------------
+# Inputs
+# -------------------------
+def iter_directory(root):
+    """Audio files under root in a stable (sorted) order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def iter_manifest(path):
+    """Paths from a CSV ("path" column, else the first) or JSONL manifest;
+    relative paths are resolved against the manifest's directory"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.reader(f)
+            header = next(reader, [])
+            column = header.index("path") if "path" in header else 0
+            rows = (row[column] for row in reader if row)
+            if header and "path" not in header:
+                # No header row: the first line is already a file
+                rows = itertools.chain([header[column]], rows)
+        else:
+            rows = (json.loads(line)["path"] for line in f if line.strip())
+
+        for p in rows:
+            yield os.path.normpath(os.path.join(base, p))
+
+
+def iter_inputs(source):
+    if os.path.isdir(source):
+        return iter_directory(source)
+    if source.lower().endswith((".csv", ".jsonl", ".ndjson")):
+        return iter_manifest(source)
+    raise SystemExit(f"❌ {source} is neither a directory nor a .csv/.jsonl manifest")
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# -------------------------
+# Model
+# -------------------------
+def load_artifacts(profile, backend):
+    """(predict_proba on raw features, class labels) for a feature profile"""
+    model_dir = MODELS_DIR if profile == "full" else os.path.join(MODELS_DIR, "profiles", profile)
+    model_path = os.path.join(model_dir, "model.pkl")
+    scaler_path = os.path.join(model_dir, "scaler.pkl")
+    classes = joblib.load(os.path.join(model_dir, "label_encoder.pkl")).classes_
+
+    if backend == "compiled":
+        compiled = load_or_compile(
+            model_path, scaler_path, os.path.join(model_dir, "model_compiled.pkl")
+        )
+        if compiled is not None:
+            return compiled.predict_proba, classes
+
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    return lambda X: model.predict_proba(scaler.transform(X)), classes
+
+
+# -------------------------
+# Output and checkpoints
+# -------------------------
+class ResultWriter:
+    """Appends rows to CSV or JSONL; ``commit`` makes them durable"""
+
+    def __init__(self, path, classes, offset):
+        self.path = path
+        self.classes = [str(c) for c in classes]
+        self.jsonl = not path.lower().endswith(".csv")
+
+        # Rows written after the last checkpoint are dropped on resume
+        mode = "r+" if offset and os.path.exists(path) else "w"
+        self.file = open(path, mode, newline="")
+        self.file.seek(offset)
+        self.file.truncate()
+
+        if not self.jsonl:
+            self.csv = csv.writer(self.file)
+            if offset == 0:
+                self.csv.writerow(
+                    ["path", "status", "emotion", "confidence"] +
+                    [f"prob_{c}" for c in self.classes]
+                )
+
+    def write(self, path, status, proba=None):
+        emotion, confidence = "", ""
+        if proba is not None:
+            best = int(np.argmax(proba))
+            confidence = round(float(proba[best]) * 100, 2)
+            emotion = self.classes[best] if confidence >= UNCERTAIN_BELOW else "uncertain"
+
+        if self.jsonl:
+            row = {"path": path, "status": status, "emotion": emotion or None,
+                   "confidence": confidence if confidence != "" else None}
+            if proba is not None:
+                row["probabilities"] = {
+                    c: round(float(p), 4) for c, p in zip(self.classes, proba)
+                }
+            self.file.write(json.dumps(row) + "\n")
+        else:
+            probs = [round(float(p), 4) for p in proba] if proba is not None else [""] * len(self.classes)
+            self.csv.writerow([path, status, emotion, confidence] + probs)
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path, source, profile):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("input") != os.path.abspath(source) or state.get("profile") != profile:
+        raise SystemExit(f"❌ {path} belongs to a different job; use --restart")
+    return state
+
+
+def save_checkpoint(path, state):
+    # Written to a temp file and renamed, so a crash never leaves half a file
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# -------------------------
+# Scoring
+# -------------------------
+def score(args):
+    checkpoint_path = args.output + ".checkpoint.json"
+    state = None if args.restart else load_checkpoint(checkpoint_path, args.input, args.profile)
+    if state is None:
+        if os.path.exists(args.output) and not args.restart:
+            raise SystemExit(f"❌ {args.output} exists without a checkpoint; use --restart")
+        state = {"input": os.path.abspath(args.input), "profile": args.profile,
+                 "done": 0, "output_bytes": 0, "counts": {}}
+    elif state["done"]:
+        print(f"↩️  Resuming after {state['done']} files")
+
+    predict_proba, classes = load_artifacts(args.profile, args.backend)
+    writer = ResultWriter(args.output, classes, state["output_bytes"])
+    groups = FEATURE_PROFILES[args.profile]
+
+    pool = None
+    if args.workers > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers, initializer=init_worker, initargs=(groups,)
+        )
+    else:
+        init_worker(groups)
+
+    inputs = itertools.islice(iter_inputs(args.input), state["done"], None)
+    start = time.perf_counter()
+    scored = 0
+    try:
+        for batch in batched(inputs, args.batch_size):
+            batch_start = time.perf_counter()
+            # Workers extract chunks of files per task
+            results = parallel_map_chunks(
+                decode_and_extract_batch, batch, n_jobs=args.workers, pool=pool
+            )
+
+            # One inference call per batch
+            ok = [i for i, (_, f, _) in enumerate(results) if f is not None]
+            probas = dict(zip(ok, predict_proba(np.vstack([results[i][1] for i in ok])))) if ok else {}
+
+            for i, (path, _, status) in enumerate(results):
+                writer.write(path, status, probas.get(i))
+                key = status.split(":")[0]
+                state["counts"][key] = state["counts"].get(key, 0) + 1
+
+            state["done"] += len(batch)
+            state["output_bytes"] = writer.commit()
+            save_checkpoint(checkpoint_path, state)
+
+            scored += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"📦 {state['done']} files | {scored / elapsed:.1f} files/s "
+                  f"(last batch {len(batch) / (time.perf_counter() - batch_start):.1f} files/s)")
+    finally:
+        writer.close()
+        if pool is not None:
+            pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    rate = scored / elapsed if elapsed else 0.0
+    print(f"✅ Scored {scored} files in {elapsed:.1f}s ({rate:.1f} files/s); "
+          f"totals: {json.dumps(state['counts'])}")
+    print(f"💾 Results in {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="directory of audio files or a .csv/.jsonl manifest")
+    parser.add_argument("output", help="results file (.csv or .jsonl)")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="feature extraction processes")
+    parser.add_argument("--batch-size", type=int, default=512,
+                        help="files per inference call and per checkpoint")
+    parser.add_argument("--profile", choices=sorted(FEATURE_PROFILES), default="full",
+                        help="feature profile whose artifacts to use")
+    parser.add_argument("--backend", choices=["sklearn", "compiled"], default="compiled",
+                        help="inference backend (compiled falls back to sklearn)")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore any checkpoint and overwrite the output")
+    score(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
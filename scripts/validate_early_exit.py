@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Early-Exit Validation for SER Project
+Compares early-exit forest evaluation with the full forest on cached
+features: agreement of the reported emotion and top-3, trees used and
+latency saved, for a range of tolerances
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.models.forest_engine import (
+    estimator_tree_proba, is_compilable, load_or_compile, progressive_proba
+)
+from src.models.trainer import SERModelTrainer
+
+MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+# Same threshold the web app uses to report "uncertain"
+UNCERTAIN_BELOW = 35
+
+
+def decode(probas):
+    """Reported class (-1 for uncertain) and top-3 classes per row"""
+    reported = np.where(probas.max(axis=1) * 100 < UNCERTAIN_BELOW, -1, probas.argmax(axis=1))
+    return reported, np.argsort(probas, axis=1)[:, ::-1][:, :3]
+
+
+def per_row_ms(fn, X, repeats):
+    """Median over repeats of the summed single-row latency, in ms per row"""
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for row in X:
+            fn(row[np.newaxis])
+        runs.append((time.perf_counter() - start) / len(X))
+    return np.median(runs) * 1000
+
+
+def load_rows(dataset, use_all, n_synthetic, scaler):
+    """Held-out (or all) cached clips, plus random rows around the training
+    distribution, which are far less clear-cut than real speech"""
+    X, y = SERModelTrainer(dataset).load_data()
+    if not use_all:
+        # The trainer's test split, so the forest has not seen these clips
+        _, X, _, _ = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+
+    sets = {("all clips" if use_all else "held-out clips"): X}
+    if n_synthetic:
+        rng = np.random.default_rng(0)
+        sets["synthetic rows"] = (
+            rng.standard_normal((n_synthetic, scaler.n_features_in_)) * scaler.scale_
+            + scaler.mean_
+        )
+    return sets
+
+
+def validate(name, X, full, progressive, tolerances, repeats):
+    print(f"\n📊 {name}: {len(X)} rows")
+    full_proba = full(X)
+    reported, top3 = decode(full_proba)
+    full_ms = per_row_ms(full, X, repeats)
+
+    print(f"{'tolerance':>10}{'emotion':>10}{'top-3':>8}{'max Δconf':>11}"
+          f"{'trees':>8}{'ms/row':>9}{'saved':>8}")
+    print(f"{'full':>10}{'':>10}{'':>8}{'':>11}{'':>8}{full_ms:9.2f}{'':>8}")
+
+    results = []
+    for tol in tolerances:
+        proba, used = progressive(X, tol)
+        p_reported, p_top3 = decode(proba)
+        rows = np.arange(len(X))[:, np.newaxis]
+        ms = per_row_ms(lambda row: progressive(row, tol), X, repeats)
+        result = {
+            "tolerance": tol,
+            "emotion_agreement": float(np.mean(p_reported == reported)),
+            # Same three classes in the same order, as the result page lists them
+            "top3_agreement": float(np.mean(np.all(p_top3 == top3, axis=1))),
+            # Largest change of a confidence the result page shows
+            "max_confidence_delta": float(
+                np.abs(proba[rows, top3] - full_proba[rows, top3]).max() * 100
+            ),
+            "mean_trees": float(used.mean()),
+            "row_latency_ms": round(ms, 3),
+            "full_row_latency_ms": round(full_ms, 3),
+            "latency_saved": round(1 - ms / full_ms, 3)
+        }
+        results.append(result)
+        print(f"{tol:>10g}{result['emotion_agreement']:>10.1%}"
+              f"{result['top3_agreement']:>8.1%}{result['max_confidence_delta']:>10.1f}%"
+              f"{result['mean_trees']:>8.0f}{ms:9.2f}{result['latency_saved']:>8.0%}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dataset", default=os.path.join(PROJECT_ROOT, "dataset"),
+                        help="Labelled dataset whose cached features are scored")
+    parser.add_argument("--all", action="store_true",
+                        help="Score every cached clip, not only the trainer's test split")
+    parser.add_argument("--synthetic", type=int, default=256,
+                        help="Random rows around the training distribution (0 to skip)")
+    parser.add_argument("--backend", choices=("compiled", "sklearn"),
+                        default=os.environ.get("SER_INFERENCE_BACKEND", "sklearn"))
+    parser.add_argument("--tolerances", default="0.001,0.01,0.05,0.1",
+                        help="Comma-separated error rates to compare")
+    parser.add_argument("--chunk", type=int, default=25, help="Trees per chunk")
+    parser.add_argument("--min-trees", type=int, default=50,
+                        help="Trees evaluated before the first stopping test")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats")
+    parser.add_argument("--save", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    model_path = os.path.join(MODELS_DIR, "model.pkl")
+    scaler_path = os.path.join(MODELS_DIR, "scaler.pkl")
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    if not is_compilable(model):
+        print(f"❌ Early exit needs a forest, the trained model is {type(model).__name__}")
+        return 1
+
+    if args.backend == "compiled":
+        compiled = load_or_compile(model_path, scaler_path)
+        full = compiled.predict_proba
+        tree_proba, n_trees = compiled.tree_proba, len(compiled.roots)
+        prepare = np.asarray
+    else:
+        full = lambda X: model.predict_proba(scaler.transform(X))
+        tree_proba, n_trees = estimator_tree_proba(model), len(model.estimators_)
+        prepare = scaler.transform
+
+    def progressive(X, tolerance):
+        return progressive_proba(
+            tree_proba, n_trees, prepare(X), tolerance=tolerance, chunk=args.chunk,
+            min_trees=args.min_trees, threshold=UNCERTAIN_BELOW / 100
+        )
+
+    print(f"🌲 {type(model).__name__} with {n_trees} trees, {args.backend} backend")
+    tolerances = [float(t) for t in args.tolerances.split(",")]
+    report = {
+        "backend": args.backend,
+        "trees": n_trees,
+        "chunk": args.chunk,
+        "min_trees": args.min_trees,
+        "sets": {
+            name: validate(name, X, full, progressive, tolerances, args.repeats)
+            for name, X in load_rows(args.dataset, args.all, args.synthetic, scaler).items()
+        }
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report saved to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,195 @@
+import time
 import librosa
 import numpy as np
 import warnings
 
 warnings.filterwarnings("ignore")
 
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# Bump whenever a change alters feature values, so cached vectors are rebuilt
+FEATURE_VERSION = 1
+
+# Order defines the layout of the 184-dim vector the models are trained on
+FEATURE_GROUPS = (
+    "mfcc", "spectral", "chroma", "contrast", "tonnetz", "basic", "harmonic"
+)
+GROUP_DIMS = {
+    "mfcc": 120, "spectral": 6, "chroma": 24, "contrast": 14,
+    "tonnetz": 12, "basic": 6, "harmonic": 2
+}
+
+# Groups computed from the harmonic/percussive separation, the most
+# expensive intermediate of the pipeline
+HPSS_GROUPS = ("tonnetz", "harmonic")
+
+# Named subsets of groups; every profile has its own trained artifacts
+FEATURE_PROFILES = {
+    "full": FEATURE_GROUPS,
+    "fast": tuple(g for g in FEATURE_GROUPS if g not in HPSS_GROUPS),
+    # Stage one of the app's cascade: no chroma, contrast or HPSS
+    "cheap": ("mfcc", "spectral", "basic")
+}
+
+
+def group_columns(groups):
+    """Indices of ``groups`` within the full feature vector"""
+    columns, offset = [], 0
+    for group in FEATURE_GROUPS:
+        if group in groups:
+            columns.extend(range(offset, offset + GROUP_DIMS[group]))
+        offset += GROUP_DIMS[group]
+    return np.array(columns, dtype=np.intp)
+
+
+class SignalAnalysis:
+    """Spectral intermediates shared by every feature group of one clip.
+
+    The STFT is computed once and the magnitude, power, mel and HPSS views
+    are derived from it on first use, so no feature group pays for its own
+    transform.
+    """
+
+    def __init__(self, y, sr):
+        self.y = y
+        self.sr = sr
+        self._cache = {}
+
+    def _get(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def stft(self):
+        return self._get("stft", lambda: librosa.stft(
+            self.y, n_fft=N_FFT, hop_length=HOP_LENGTH
+        ))
+
+    @property
+    def magnitude(self):
+        return self._get("magnitude", lambda: np.abs(self.stft))
+
+    @property
+    def power(self):
+        return self._get("power", lambda: self.magnitude ** 2)
+
+    @property
+    def mel(self):
+        return self._get("mel", lambda: librosa.feature.melspectrogram(
+            S=self.power, sr=self.sr
+        ))
+
+    @property
+    def hpss(self):
+        return self._get("hpss", self._hpss)
+
+    @property
+    def harmonic(self):
+        return self.hpss[0]
+
+    @property
+    def percussive(self):
+        return self.hpss[1]
+
+    def _hpss(self):
+        # Same decomposition as librosa.effects.hpss, reusing our STFT
+        stft_harm, stft_perc = librosa.decompose.hpss(self.stft)
+        h = librosa.istft(
+            stft_harm, dtype=self.y.dtype, hop_length=HOP_LENGTH,
+            length=len(self.y)
+        )
+        p = librosa.istft(
+            stft_perc, dtype=self.y.dtype, hop_length=HOP_LENGTH,
+            length=len(self.y)
+        )
+        return h, p
+
+
 class AudioFeatureExtractor:
-    def __init__(self, sample_rate=16000):
+    FEATURE_GROUPS = FEATURE_GROUPS
+
+    def __init__(self, sample_rate=16000, group_hook=None, groups=None):
         self.sample_rate = sample_rate
+        # Optional callable(group, seconds) run after each feature group
+        self.group_hook = group_hook
+
+        # A subset of FEATURE_GROUPS, always kept in the canonical order
+        groups = FEATURE_GROUPS if groups is None else groups
+        unknown = set(groups) - set(FEATURE_GROUPS)
+        if unknown:
+            raise ValueError(f"Unknown feature groups: {sorted(unknown)}")
+        self.groups = tuple(g for g in FEATURE_GROUPS if g in groups)
+
+    @property
+    def version(self):
+        return "v{}-{}hz-{}".format(
+            FEATURE_VERSION, self.sample_rate, "+".join(self.groups)
+        )
 
     def extract(self, file_path):
         try:
             y, sr = librosa.load(file_path, sr=self.sample_rate, mono=True)
+        except Exception as e:
+            print("Feature extraction error:", e)
+            return None
 
-            if len(y) < sr * 0.5:
-                return None
-
-            features = []
+        return self.extract_from_array(y, sr)
 
-            features.append(self._mfcc(y, sr))
-            features.append(self._spectral(y, sr))
-            features.append(self._chroma(y, sr))
-            features.append(self._contrast(y, sr))
-            features.append(self._tonnetz(y, sr))
-            features.append(self._basic(y, sr))
-            features.append(self._harmonic(y, sr))  # rhythm REMOVED
+    def extract_from_array(self, y, sr=None):
+        # Entry point for audio that is already decoded in memory
+        try:
+            y = self._prepare(y, sr)
+            if y is None:
+                return None
 
-            features = [np.ravel(f) for f in features]
-            return np.hstack(features).astype(np.float32)
+            return self._extract_signal(y, self.sample_rate)
 
         except Exception as e:
             print("Feature extraction error:", e)
             return None
 
-    def _mfcc(self, y, sr):
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=40)
+    def extract_batch(self, signals, sr=None):
+        """Features for a chunk of decoded clips, in input order.
+
+        Each clip goes through ``extract_from_array``, so results are
+        identical to scoring it alone, including None for unusable clips
+        (and for None entries in ``signals``). Parallelism comes from
+        handing chunks to workers with ``parallel_map_chunks``.
+        """
+        return [None if y is None else self.extract_from_array(y, sr) for y in signals]
+
+    def _prepare(self, y, sr=None):
+        """Mono float32 at self.sample_rate, or None when too short"""
+        sr = sr or self.sample_rate
+        y = np.asarray(y, dtype=np.float32)
+        if y.ndim > 1:
+            y = librosa.to_mono(y)
+        if sr != self.sample_rate:
+            y = librosa.resample(y, orig_sr=sr, target_sr=self.sample_rate)
+
+        if len(y) < self.sample_rate * 0.5:
+            return None
+        return y
+
+    def _extract_signal(self, y, sr):
+        analysis = SignalAnalysis(y, sr)
+
+        features = []
+        for group in self.groups:
+            start = time.perf_counter()
+            features.append(getattr(self, "_" + group)(analysis))
+            if self.group_hook is not None:
+                self.group_hook(group, time.perf_counter() - start)
+
+        features = [np.ravel(f) for f in features]
+        return np.hstack(features).astype(np.float32)
+
+    def _mfcc(self, a):
+        mfcc = librosa.feature.mfcc(
+            S=librosa.power_to_db(a.mel), sr=a.sr, n_mfcc=40
+        )
         delta = librosa.feature.delta(mfcc)
         return np.hstack([
             np.mean(mfcc, axis=1),
@@ -41,40 +197,39 @@ class AudioFeatureExtractor:
             np.mean(delta, axis=1)
         ])
 
-    def _spectral(self, y, sr):
-        c = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-        b = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
-        r = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
+    def _spectral(self, a):
+        S = a.magnitude
+        c = librosa.feature.spectral_centroid(S=S, sr=a.sr)
+        b = librosa.feature.spectral_bandwidth(S=S, sr=a.sr, centroid=c)[0]
+        r = librosa.feature.spectral_rolloff(S=S, sr=a.sr)[0]
+        c = c[0]
         return np.array([
             np.mean(c), np.std(c),
             np.mean(b), np.std(b),
             np.mean(r), np.std(r)
         ])
 
-    def _chroma(self, y, sr):
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+    def _chroma(self, a):
+        chroma = librosa.feature.chroma_stft(S=a.power, sr=a.sr)
         return np.hstack([np.mean(chroma, axis=1), np.std(chroma, axis=1)])
 
-    def _contrast(self, y, sr):
-        contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
+    def _contrast(self, a):
+        contrast = librosa.feature.spectral_contrast(S=a.magnitude, sr=a.sr)
         return np.hstack([np.mean(contrast, axis=1), np.std(contrast, axis=1)])
 
-    def _tonnetz(self, y, sr):
-        tonnetz = librosa.feature.tonnetz(
-            y=librosa.effects.harmonic(y), sr=sr
-        )
+    def _tonnetz(self, a):
+        tonnetz = librosa.feature.tonnetz(y=a.harmonic, sr=a.sr)
         return np.hstack([np.mean(tonnetz, axis=1), np.std(tonnetz, axis=1)])
 
-    def _basic(self, y, sr):
-        zcr = librosa.feature.zero_crossing_rate(y)[0]
-        rms = librosa.feature.rms(y=y)[0]
-        flat = librosa.feature.spectral_flatness(y=y)[0]
+    def _basic(self, a):
+        zcr = librosa.feature.zero_crossing_rate(a.y)[0]
+        rms = librosa.feature.rms(y=a.y)[0]
+        flat = librosa.feature.spectral_flatness(S=a.magnitude)[0]
         return np.array([
             np.mean(zcr), np.std(zcr),
             np.mean(rms), np.std(rms),
             np.mean(flat), np.std(flat)
         ])
 
-    def _harmonic(self, y, sr):
-        h, p = librosa.effects.hpss(y)
-        return np.array([np.mean(h), np.mean(p)])
+    def _harmonic(self, a):
+        return np.array([np.mean(a.harmonic), np.mean(a.percussive)])
@@ -0,0 +1,67 @@
+import os
+import joblib
+
+
+class FeatureStore:
+    """On-disk map of audio file -> extracted feature vector.
+
+    Entries are keyed by absolute path and remain valid while the file's
+    size/mtime and the extractor version match, so retraining only pays
+    for new or changed files.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self._entries = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            data = joblib.load(self.path)
+        except Exception as e:
+            print("Feature store unreadable, rebuilding:", e)
+            return
+        # A different extractor version invalidates every entry
+        if data.get("version") == self.version:
+            self._entries = data.get("entries", {})
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    @staticmethod
+    def _signature(file_path):
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def get(self, file_path):
+        """Return (found, features); features may be None for unusable clips"""
+        entry = self._entries.get(self._key(file_path))
+        if entry is None or entry[0] != self._signature(file_path):
+            return False, None
+        return True, entry[1]
+
+    def put(self, file_path, features):
+        self._entries[self._key(file_path)] = (self._signature(file_path), features)
+        self._dirty = True
+
+    def retain(self, file_paths):
+        """Drop entries for files that are no longer part of the dataset"""
+        keep = {self._key(p) for p in file_paths}
+        stale = [k for k in self._entries if k not in keep]
+        for k in stale:
+            del self._entries[k]
+        self._dirty = self._dirty or bool(stale)
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        joblib.dump({"version": self.version, "entries": self._entries}, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,147 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import librosa
+import numpy as np
+
+from src.features.audio_features import AudioFeatureExtractor
+from src.utils.audio_io import decode_audio
+
+# One extractor per worker process, created lazily on first use, plus
+# one per other group subset a caller asks for
+_worker_extractor = None
+_worker_groups = None
+_group_extractors = {}
+
+
+def init_worker(groups=None, warm_up=False):
+    """Pool initializer: extract only ``groups`` in this worker.
+
+    With ``warm_up`` a synthetic clip is extracted once, so the worker's
+    first real job does not pay librosa/numba compilation.
+    """
+    global _worker_extractor, _worker_groups
+    _worker_groups = groups
+    _worker_extractor = None
+    if warm_up:
+        t = np.arange(16000) / 16000
+        _get_extractor().extract_from_array(0.1 * np.sin(2 * np.pi * 180 * t))
+
+
+def _get_extractor(groups=None):
+    global _worker_extractor
+    if groups is not None:
+        if groups not in _group_extractors:
+            _group_extractors[groups] = AudioFeatureExtractor(16000, groups=groups)
+        return _group_extractors[groups]
+    if _worker_extractor is None:
+        _worker_extractor = AudioFeatureExtractor(16000, groups=_worker_groups)
+    return _worker_extractor
+
+
+def extract_file(path):
+    return path, _get_extractor().extract(path)
+
+
+def extract_array(y, sr=16000):
+    return _get_extractor().extract_from_array(y, sr)
+
+
+def extract_files(paths):
+    """[(path, features)] for a chunk of files, in one worker call"""
+    extractor = _get_extractor()
+    signals = []
+    for path in paths:
+        try:
+            y, _ = librosa.load(path, sr=extractor.sample_rate, mono=True)
+        except Exception as e:
+            print("Feature extraction error:", e)
+            y = None
+        signals.append(y)
+    return list(zip(paths, extractor.extract_batch(signals)))
+
+
+def extract_arrays(signals, sr=16000):
+    return _get_extractor().extract_batch(signals, sr)
+
+
+def extract_array_timed(y, sr=16000, groups=None):
+    """Features plus [(group, seconds)], for metrics in the parent process;
+    ``groups`` (a tuple) extracts that subset instead of the worker's"""
+    extractor = _get_extractor(groups)
+    timings = []
+    extractor.group_hook = lambda group, seconds: timings.append((group, seconds))
+    try:
+        return extractor.extract_from_array(y, sr), timings
+    finally:
+        extractor.group_hook = None
+
+
+def decode_and_extract(path, silence_rms=0.01):
+    """(path, features, status) for any decodable file.
+
+    Status is "ok", "silent" (below the app's energy gate), "too_short" or
+    "error: ..."; features are only set for "ok".
+    """
+    return decode_and_extract_batch([path], silence_rms)[0]
+
+
+def decode_and_extract_batch(paths, silence_rms=0.01):
+    """decode_and_extract for a chunk of files, in one worker call"""
+    results = [None] * len(paths)
+    decoded = []
+    for i, path in enumerate(paths):
+        try:
+            y = decode_audio(path)
+        except Exception as e:
+            results[i] = (path, None, f"error: {e}")
+            continue
+        if not len(y) or np.mean(librosa.feature.rms(y=y)) < silence_rms:
+            results[i] = (path, None, "silent")
+        else:
+            decoded.append((i, y))
+
+    features = _get_extractor().extract_batch([y for _, y in decoded])
+    for (i, _), feat in zip(decoded, features):
+        status = "ok" if feat is not None else "too_short"
+        results[i] = (paths[i], feat, status)
+    return results
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def parallel_map_chunks(func, items, n_jobs=None, pool=None, chunk_size=32):
+    """Like parallel_map, but ``func`` takes a list of items and returns
+    one result per item; used with the batched extraction helpers.
+
+    Chunks hold at most ``chunk_size`` items and there are at least as many
+    chunks as workers, so small inputs still use the whole pool.
+    """
+    items = list(items)
+    n_jobs = n_jobs or default_workers()
+    size = max(1, min(chunk_size, -(-len(items) // n_jobs)))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    return [r for chunk in parallel_map(func, chunks, n_jobs, pool) for r in chunk]
+
+
+def parallel_map(func, items, n_jobs=None, pool=None):
+    """Run func over items on a process pool, preserving order.
+
+    Uses ``pool`` when given (long-lived executors in the web app),
+    otherwise a temporary pool of ``n_jobs`` workers. Falls back to a
+    plain loop for a single worker or a single item.
+    """
+    items = list(items)
+    n_jobs = n_jobs or default_workers()
+
+    if pool is None and (n_jobs <= 1 or len(items) <= 1):
+        return [func(item) for item in items]
+
+    chunksize = max(1, len(items) // (n_jobs * 4))
+    if pool is not None:
+        return list(pool.map(func, items, chunksize=chunksize))
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
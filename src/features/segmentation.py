@@ -0,0 +1,137 @@
+import numpy as np
+from collections import deque
+
+# Same level as the app's RMS gate for whole clips
+SILENCE_RMS = 0.01
+
+
+class EnergySegmenter:
+    """Splits a stream of audio blocks into voiced segments.
+
+    Frames of ``frame_length`` samples are voiced when their RMS reaches
+    ``threshold``. A segment opens on a voiced frame, with ``padding``
+    seconds of pre-roll. It closes after ``min_silence`` seconds of
+    silence, or is cut at ``max_segment`` seconds so long speech still
+    yields a timeline. Segments shorter than ``min_segment`` are dropped.
+    Only the open segment is buffered, so memory does not grow with the
+    length of the recording.
+    """
+
+    def __init__(self, sample_rate=16000, threshold=SILENCE_RMS, frame_length=512,
+                 min_silence=0.4, min_segment=1.0, max_segment=8.0, padding=0.1):
+        self.sr = sample_rate
+        self.threshold = threshold
+        self.frame_length = frame_length
+
+        frames = lambda seconds: max(1, int(round(seconds * sample_rate / frame_length)))
+        self.min_silence_frames = frames(min_silence)
+        self.min_segment_frames = frames(min_segment)
+        self.max_segment_frames = frames(max_segment)
+        self.pad_frames = int(round(padding * sample_rate / frame_length))
+
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._frame_index = 0
+        self._preroll = deque(maxlen=self.pad_frames or None)
+        self._segment = None
+        self._segment_start = 0
+        self._silence = 0
+
+    def push(self, samples):
+        """Feed samples; returns [(start_s, end_s, samples)] for closed segments"""
+        samples = np.concatenate([self._remainder, np.asarray(samples, dtype=np.float32)])
+        n = len(samples) // self.frame_length
+        self._remainder = samples[n * self.frame_length:]
+
+        frames = samples[:n * self.frame_length].reshape(n, self.frame_length)
+        voiced = np.sqrt(np.mean(frames ** 2, axis=1)) >= self.threshold
+
+        segments = []
+        for frame, is_voiced in zip(frames, voiced):
+            segment = self._step(frame, is_voiced)
+            if segment is not None:
+                segments.append(segment)
+            self._frame_index += 1
+        return segments
+
+    def flush(self):
+        """Close the open segment at the end of the stream"""
+        if self._segment is not None and len(self._remainder):
+            self._segment.append(self._remainder)
+        self._remainder = np.zeros(0, dtype=np.float32)
+        segment = self._close(trailing=self._silence)
+        return [segment] if segment is not None else []
+
+    def _step(self, frame, is_voiced):
+        if self._segment is None:
+            if not is_voiced:
+                if self.pad_frames:
+                    self._preroll.append(frame)
+                return None
+            self._segment = list(self._preroll) + [frame]
+            self._segment_start = self._frame_index - len(self._preroll)
+            self._preroll.clear()
+            self._silence = 0
+            return None
+
+        self._segment.append(frame)
+        self._silence = 0 if is_voiced else self._silence + 1
+
+        if self._silence >= self.min_silence_frames:
+            return self._close(trailing=self._silence)
+
+        if len(self._segment) >= self.max_segment_frames:
+            # Cut long speech; the next frame starts a new segment
+            segment = self._close(trailing=0)
+            self._segment = []
+            self._segment_start = self._frame_index + 1
+            return segment
+        return None
+
+    def _close(self, trailing):
+        frames, start = self._segment, self._segment_start
+        self._segment = None
+        self._silence = 0
+        if not frames:
+            return None
+
+        # Keep only ``padding`` worth of the trailing silence
+        keep = len(frames) - max(0, trailing - self.pad_frames)
+        frames = frames[:keep]
+        if len(frames) - self.pad_frames < self.min_segment_frames:
+            return None
+
+        samples = np.concatenate(frames)
+        start_s = start * self.frame_length / self.sr
+        return round(start_s, 3), round(start_s + len(samples) / self.sr, 3), samples
+
+
+def summarize_timeline(timeline, duration):
+    """Duration-weighted summary of a per-segment emotion timeline"""
+    voiced = sum(s["end"] - s["start"] for s in timeline)
+    seconds = {}
+    weighted_confidence = {}
+    for s in timeline:
+        length = s["end"] - s["start"]
+        seconds[s["emotion"]] = seconds.get(s["emotion"], 0) + length
+        weighted_confidence[s["emotion"]] = (
+            weighted_confidence.get(s["emotion"], 0) + s["confidence"] * length
+        )
+
+    # "uncertain" only wins when nothing else was recognised
+    candidates = {e: t for e, t in seconds.items() if e != "uncertain"} or seconds
+    dominant = max(candidates, key=candidates.get) if candidates else None
+
+    return {
+        "duration": round(duration, 2),
+        "voiced_seconds": round(voiced, 2),
+        "segments": len(timeline),
+        "dominant_emotion": dominant,
+        "dominant_confidence": (
+            round(weighted_confidence[dominant] / seconds[dominant], 2)
+            if dominant else 0.0
+        ),
+        "emotion_share": {
+            e: round(100 * t / voiced, 1)
+            for e, t in sorted(seconds.items(), key=lambda kv: -kv[1])
+        } if voiced else {}
+    }
@@ -0,0 +1,362 @@
+import librosa
+import numpy as np
+import scipy.ndimage
+import scipy.signal
+from collections import deque
+
+from src.features.audio_features import (
+    FEATURE_GROUPS, HOP_LENGTH, HPSS_GROUPS, N_FFT, group_columns
+)
+
+# HPSS median filter reaches this many frames into the future
+HPSS_LOOKAHEAD = 15
+# Context around chroma_cqt blocks so the lowest CQT filters see full support
+CQT_LEFT_CONTEXT = 8192
+CQT_RIGHT_CONTEXT = 4096
+# chroma_cqt rebuilds its filter bank per call, so run it on ~1 s blocks
+TONNETZ_BLOCK_FRAMES = 32
+
+
+class PitchWindow:
+    """Rolling librosa.estimate_tuning over the last n frames.
+
+    piptrack works frame by frame, so candidates are stored per frame and
+    the median threshold and tuning histogram are taken over the window.
+    """
+
+    def __init__(self, sr, n_frames):
+        self.sr = sr
+        self._frames = deque(maxlen=n_frames)
+
+    def add(self, S):
+        pitch, mag = librosa.piptrack(S=S, sr=self.sr)
+        for t in range(S.shape[1]):
+            mask = pitch[:, t] > 0
+            self._frames.append((pitch[mask, t], mag[mask, t]))
+
+    def tuning(self):
+        if not self._frames:
+            return 0.0
+        pitch = np.concatenate([f[0] for f in self._frames])
+        mag = np.concatenate([f[1] for f in self._frames])
+        threshold = np.median(mag) if len(mag) else 0.0
+        return librosa.pitch_tuning(pitch[mag >= threshold], bins_per_octave=12)
+
+
+class StreamingFeatureExtractor:
+    """Incremental version of AudioFeatureExtractor for live audio.
+
+    Audio arrives in arbitrary chunks. Every STFT frame is computed exactly
+    once, when its full window has arrived, and reduced to per-frame columns
+    (mel power, spectral shape, chroma, contrast, zcr/rms/flatness). HPSS is
+    finalised frame by frame once its median filter has enough lookahead,
+    the harmonic signal is rebuilt by overlap-add, and tonnetz is computed
+    on each new harmonic block. Every ``update_seconds`` the columns of the
+    last ``window_seconds`` are reduced to the same 184-dim layout as
+    ``AudioFeatureExtractor``, so the trained model can score them.
+
+    Values match a full extraction of the window up to edge effects at the
+    window start and the tonnetz tuning, which is estimated from the frames
+    seen so far rather than the whole window. With ``groups`` only those
+    feature groups are emitted, and HPSS is skipped when none needs it.
+    """
+
+    def __init__(self, sample_rate=16000, window_seconds=3.0, update_seconds=0.5,
+                 groups=None):
+        self.sr = sample_rate
+        groups = FEATURE_GROUPS if groups is None else groups
+        self.columns = group_columns(groups)
+        self.use_hpss = any(g in groups for g in HPSS_GROUPS)
+        self.window_frames = max(1, int(round(window_seconds * sample_rate / HOP_LENGTH)))
+        self.update_samples = max(HOP_LENGTH, int(update_seconds * sample_rate))
+        self.min_frames = int(0.5 * sample_rate / HOP_LENGTH)
+
+        self._window = scipy.signal.get_window("hann", N_FFT, fftbins=True).astype(np.float32)
+        self._mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=N_FFT)
+
+        # Padded stream (N_FFT // 2 leading zeros, like center=True)
+        self._buf = np.zeros(N_FFT // 2, dtype=np.float32)
+        self._buf_start = 0
+        self._received = 0
+        self._next_emit = self.update_samples
+        self._pitches = PitchWindow(sample_rate, self.window_frames)
+        self._harm_pitches = PitchWindow(sample_rate, self.window_frames)
+
+        self._next_frame = 0
+        self._stft = np.zeros((N_FFT // 2 + 1, 0), dtype=np.complex64)
+        self._stft_start = 0
+        self._hpss_next = 0
+
+        # Overlap-add accumulators for the harmonic/percussive signals
+        self._ola = np.zeros((3, 0), dtype=np.float64)
+        self._ola_start = 0
+        self._harm = np.zeros(0, dtype=np.float32)
+        self._harm_start = 0
+        self._slot_next = 0
+        self._slot_tail = (np.zeros(0, np.float32), np.zeros(0, np.float32))
+        self._tonnetz_next = 0
+
+        self._cols = {}
+        self._col_end = {}
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    @property
+    def seconds(self):
+        return self._received / self.sr
+
+    def push(self, samples):
+        """Feed new samples; returns [(t, features, rms)] for each update"""
+        samples = np.asarray(samples, dtype=np.float32).ravel()
+        updates = []
+        while len(samples):
+            # Stop at every update boundary so each emitted window ends there
+            take = min(len(samples), self._next_emit - self._received)
+            self._append(samples[:take])
+            samples = samples[take:]
+            if self._received >= self._next_emit:
+                self._next_emit += self.update_samples
+                self._process()
+                update = self._emit()
+                if update is not None:
+                    updates.append(update)
+        return updates
+
+    def flush(self):
+        """Finalise trailing frames as a full extraction would and emit"""
+        tail = np.zeros(N_FFT // 2, dtype=np.float32)
+        self._buf = np.concatenate([self._buf, tail])
+        self._process(final=True)
+        update = self._emit()
+        return [update] if update is not None else []
+
+    # -------------------------
+    # Frame processing
+    # -------------------------
+    def _append(self, samples):
+        # Frames are processed once per update hop, not per network chunk
+        self._buf = np.concatenate([self._buf, samples])
+        self._received += len(samples)
+
+    def _process(self, final=False):
+        buf_end = self._buf_start + len(self._buf)
+        k1 = (buf_end - N_FFT) // HOP_LENGTH + 1 if buf_end >= N_FFT else 0
+        if k1 > self._next_frame:
+            self._frames(self._next_frame, k1)
+            self._next_frame = k1
+
+        if self.use_hpss:
+            self._hpss(final)
+            self._tonnetz(final)
+        self._trim()
+
+    def _frames(self, k0, k1):
+        lo = k0 * HOP_LENGTH - self._buf_start
+        hi = (k1 - 1) * HOP_LENGTH + N_FFT - self._buf_start
+        seg = self._buf[lo:hi]
+        sr = self.sr
+
+        D = librosa.stft(seg, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)
+        mag = np.abs(D)
+        power = mag ** 2
+
+        self._pitches.add(power)
+
+        c = librosa.feature.spectral_centroid(S=mag, sr=sr)
+        self._add("mel", k0, self._mel_basis.dot(power))
+        self._add("spectral", k0, np.vstack([
+            c,
+            librosa.feature.spectral_bandwidth(S=mag, sr=sr, centroid=c),
+            librosa.feature.spectral_rolloff(S=mag, sr=sr)
+        ]))
+        # Chroma needs the window's tuning, so keep power and project on emit
+        self._add("power", k0, power)
+        self._add("contrast", k0, librosa.feature.spectral_contrast(S=mag, sr=sr))
+
+        self._add("basic", k0, np.vstack([
+            librosa.feature.zero_crossing_rate(seg, center=False),
+            librosa.feature.rms(y=seg, center=False),
+            librosa.feature.spectral_flatness(S=mag)
+        ]))
+
+        if self.use_hpss:
+            self._stft = np.hstack([self._stft, D])
+
+    def _hpss(self, final):
+        # Frames can be separated once HPSS_LOOKAHEAD later frames exist
+        h1 = self._next_frame if final else self._next_frame - HPSS_LOOKAHEAD
+        if h1 <= self._hpss_next:
+            return
+
+        lo = max(self._stft_start, self._hpss_next - HPSS_LOOKAHEAD)
+        sel = slice(self._hpss_next - lo, h1 - lo)
+        S, phase = librosa.magphase(self._stft[:, lo - self._stft_start:])
+
+        # librosa.decompose.hpss, but each median is only taken where needed:
+        # across time over the lookahead slab, across frequency for new frames
+        harm = scipy.ndimage.median_filter(
+            S, size=(1, 2 * HPSS_LOOKAHEAD + 1), mode="reflect"
+        )[:, sel]
+        perc = scipy.ndimage.median_filter(
+            S[:, sel], size=(2 * HPSS_LOOKAHEAD + 1, 1), mode="reflect"
+        )
+        mask_h = librosa.util.softmask(harm, perc, power=2, split_zeros=True)
+        mask_p = librosa.util.softmask(perc, harm, power=2, split_zeros=True)
+        H = S[:, sel] * mask_h * phase[:, sel]
+        P = S[:, sel] * mask_p * phase[:, sel]
+
+        self._harm_pitches.add(np.abs(H))
+        self._overlap_add(self._hpss_next, H, P)
+        self._hpss_next = h1
+
+    def _overlap_add(self, k0, H, P):
+        n = H.shape[1]
+        end = (k0 + n - 1) * HOP_LENGTH + N_FFT
+        if end - self._ola_start > self._ola.shape[1]:
+            grow = end - self._ola_start - self._ola.shape[1]
+            self._ola = np.hstack([self._ola, np.zeros((3, grow))])
+
+        h_frames = np.fft.irfft(H, n=N_FFT, axis=0) * self._window[:, None]
+        p_frames = np.fft.irfft(P, n=N_FFT, axis=0) * self._window[:, None]
+        wss = self._window.astype(np.float64) ** 2
+        for i in range(n):
+            at = (k0 + i) * HOP_LENGTH - self._ola_start
+            self._ola[0, at:at + N_FFT] += h_frames[:, i]
+            self._ola[1, at:at + N_FFT] += p_frames[:, i]
+            self._ola[2, at:at + N_FFT] += wss
+
+        # Samples before the next frame start will not change any more
+        done = (k0 + n) * HOP_LENGTH - self._ola_start
+        h, p, w = self._ola[:, :done]
+        nz = w > np.finfo(np.float32).tiny
+        h = np.where(nz, h / np.where(nz, w, 1), h).astype(np.float32)
+        p = np.where(nz, p / np.where(nz, w, 1), p).astype(np.float32)
+        self._ola = self._ola[:, done:]
+        start = self._ola_start
+        self._ola_start += done
+
+        # Drop the center padding: buffer index b is signal sample b - N_FFT // 2
+        pad = N_FFT // 2
+        if start < pad:
+            cut = min(pad - start, len(h))
+            h, p, start = h[cut:], p[cut:], start + cut
+        self._harm = np.concatenate([self._harm, h])
+        self._slot_sums(start - pad, h, p)
+
+    def _slot_sums(self, s0, h, p):
+        # Per-hop sums of h and p so window means need no sample buffer
+        h = np.concatenate([self._slot_tail[0], h])
+        p = np.concatenate([self._slot_tail[1], p])
+        n = len(h) // HOP_LENGTH
+        if n:
+            sums = np.vstack([
+                h[:n * HOP_LENGTH].reshape(n, HOP_LENGTH).sum(axis=1),
+                p[:n * HOP_LENGTH].reshape(n, HOP_LENGTH).sum(axis=1)
+            ])
+            self._add("harmonic", self._slot_next, sums)
+            self._slot_next += n
+        self._slot_tail = (h[n * HOP_LENGTH:], p[n * HOP_LENGTH:])
+
+    def _tonnetz(self, final):
+        harm_end = self._harm_start + len(self._harm)
+        if final:
+            j1 = harm_end // HOP_LENGTH + 1
+        else:
+            j1 = max(0, (harm_end - CQT_RIGHT_CONTEXT) // HOP_LENGTH + 1)
+            if j1 - self._tonnetz_next < TONNETZ_BLOCK_FRAMES:
+                return
+        if j1 <= self._tonnetz_next:
+            return
+
+        j0 = self._tonnetz_next
+        seg0 = max(self._harm_start, j0 * HOP_LENGTH - CQT_LEFT_CONTEXT)
+        seg0 -= seg0 % HOP_LENGTH
+        seg0 = max(seg0, self._harm_start)
+        seg = self._harm[seg0 - self._harm_start:]
+
+        chroma = librosa.feature.chroma_cqt(
+            y=seg, sr=self.sr, tuning=self._harm_pitches.tuning()
+        )
+        first = seg0 // HOP_LENGTH
+        chroma = chroma[:, j0 - first:j1 - first]
+        if chroma.shape[1]:
+            tonnetz = librosa.feature.tonnetz(chroma=chroma, sr=self.sr)
+            self._add("tonnetz", j0, tonnetz)
+            self._tonnetz_next = j0 + chroma.shape[1]
+
+    # -------------------------
+    # Column store
+    # -------------------------
+    def _add(self, name, k0, cols):
+        cols = np.atleast_2d(cols)
+        if name in self._cols:
+            self._cols[name] = np.hstack([self._cols[name], cols])
+        else:
+            self._cols[name] = cols
+        self._cols[name] = self._cols[name][:, -self.window_frames:]
+        self._col_end[name] = k0 + cols.shape[1]
+
+    def _trim(self):
+        # Keep only what later frames, HPSS and CQT context still need
+        keep_sample = self._next_frame * HOP_LENGTH
+        if keep_sample > self._buf_start:
+            self._buf = self._buf[keep_sample - self._buf_start:]
+            self._buf_start = keep_sample
+
+        keep_stft = max(self._stft_start, self._hpss_next - HPSS_LOOKAHEAD)
+        if keep_stft > self._stft_start:
+            self._stft = self._stft[:, keep_stft - self._stft_start:]
+            self._stft_start = keep_stft
+
+        keep_harm = max(
+            self._harm_start,
+            self._tonnetz_next * HOP_LENGTH - CQT_LEFT_CONTEXT - HOP_LENGTH
+        )
+        if keep_harm > self._harm_start:
+            self._harm = self._harm[keep_harm - self._harm_start:]
+            self._harm_start = keep_harm
+
+    # -------------------------
+    # Window reduction
+    # -------------------------
+    def _emit(self):
+        cols = self._cols
+        if "mel" not in cols or cols["mel"].shape[1] < self.min_frames:
+            return None
+
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(cols["mel"]), n_mfcc=40)
+        delta = librosa.feature.delta(mfcc)
+        chroma = librosa.feature.chroma_stft(
+            S=cols["power"], sr=self.sr, tuning=self._pitches.tuning()
+        )
+        groups = [
+            np.hstack([mfcc.mean(axis=1), mfcc.std(axis=1), delta.mean(axis=1)]),
+            self._mean_std(cols["spectral"]),
+            np.hstack([chroma.mean(axis=1), chroma.std(axis=1)]),
+            np.hstack([cols["contrast"].mean(axis=1), cols["contrast"].std(axis=1)]),
+            self._tonnetz_stats(),
+            self._mean_std(cols["basic"]),
+            self._harmonic_means()
+        ]
+        features = np.hstack([np.ravel(g) for g in groups]).astype(np.float32)
+        features = features[self.columns]
+        rms = float(np.mean(cols["basic"][1]))
+        return round(self.seconds, 3), features, rms
+
+    @staticmethod
+    def _mean_std(cols):
+        # Interleaved mean/std per row, matching the extractor layout
+        return np.column_stack([cols.mean(axis=1), cols.std(axis=1)]).ravel()
+
+    def _tonnetz_stats(self):
+        tonnetz = self._cols.get("tonnetz")
+        if tonnetz is None or not tonnetz.shape[1]:
+            return np.zeros(12)
+        return np.hstack([tonnetz.mean(axis=1), tonnetz.std(axis=1)])
+
+    def _harmonic_means(self):
+        sums = self._cols.get("harmonic")
+        if sums is None or not sums.shape[1]:
+            return np.zeros(2)
+        return sums.sum(axis=1) / (sums.shape[1] * HOP_LENGTH)
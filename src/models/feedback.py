@@ -0,0 +1,52 @@
+import os
+import json
+import time
+import threading
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+FEEDBACK_SAMPLES_PATH = os.path.join(PROJECT_ROOT, "models", "feedback_samples.jsonl")
+
+
+class FeedbackStore:
+    """Append-only JSON-lines log of user-labelled feature vectors.
+
+    Each line holds the features the app scored, the label the user
+    confirmed or corrected, and the extractor version, so samples from
+    another feature profile or an older extractor are never mixed in.
+    """
+
+    def __init__(self, path=FEEDBACK_SAMPLES_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def add(self, features, label, version, predicted=None):
+        record = {
+            "time": round(time.time(), 3),
+            "label": label,
+            "predicted": predicted,
+            "version": version,
+            "features": np.asarray(features, dtype=np.float32).tolist()
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def load(self, version):
+        """(X, labels) of every sample recorded with this extractor version"""
+        X, labels = [], []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if record.get("version") == version:
+                        X.append(record["features"])
+                        labels.append(record["label"])
+        return np.array(X, dtype=np.float32), np.array(labels)
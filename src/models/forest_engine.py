@@ -0,0 +1,339 @@
+import os
+import sys
+import joblib
+import numpy as np
+from statistics import NormalDist
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
+COMPILED_MODEL_PATH = os.path.join(MODELS_DIR, "model_compiled.pkl")
+
+# Rows are compared in float32, the dtype sklearn trees evaluate in
+_FLOAT_BITS = np.int32
+
+
+def _ordered(bits):
+    # Map float32 bit patterns to integers with the same ordering as the floats
+    bits = bits.astype(np.int64)
+    return np.where(bits < 0, -(bits & 0x7FFFFFFF) - 1, bits)
+
+
+def _unordered(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    bits = np.where(keys < 0, (-(keys + 1)) | -0x80000000, keys)
+    return bits.astype(_FLOAT_BITS).view(np.float32)
+
+
+def _raw_thresholds(scaler, features, thresholds, chunk_size=4096):
+    """Largest raw float32 value per split that still goes left.
+
+    ``scaler.transform`` followed by the float32 cast is monotone, so
+    ``scaled(x) <= t`` is equivalent to ``x <= T`` for a single raw
+    threshold ``T``. It is found by bisection over float32 values, calling
+    the scaler itself so the result matches its rounding bit for bit.
+    """
+    n_features = scaler.n_features_in_
+    out = np.empty(len(features), dtype=np.float32)
+
+    for start in range(0, len(features), chunk_size):
+        f = features[start:start + chunk_size]
+        t = thresholds[start:start + chunk_size]
+        rows = np.arange(len(f))
+        lo = np.full(len(f), _ordered(np.array([-np.inf], np.float32).view(_FLOAT_BITS))[0])
+        hi = np.full(len(f), _ordered(np.array([np.inf], np.float32).view(_FLOAT_BITS))[0])
+
+        grid = np.zeros((len(f), n_features), dtype=np.float32)
+        while np.any(hi - lo > 1):
+            mid = (lo + hi) // 2
+            grid[rows, f] = _unordered(mid)
+            goes_left = scaler.transform(grid)[rows, f].astype(np.float32) <= t
+            lo = np.where(goes_left, mid, lo)
+            hi = np.where(goes_left, hi, mid)
+
+        out[start:start + len(f)] = _unordered(lo)
+    return out
+
+
+class CompiledForest:
+    """A fitted RandomForestClassifier flattened into contiguous arrays.
+
+    All trees share one node table. Each node has a feature index, a
+    float32 threshold and a pair of children, and leaves point at
+    themselves, so a fixed number of vectorized steps walks every tree for
+    every row at once. When a StandardScaler is merged in, thresholds are
+    moved to raw feature space and ``predict_proba`` takes unscaled rows.
+    Probabilities match sklearn's ``predict_proba`` exactly.
+    """
+
+    def __init__(self, feature, threshold, children, leaf_index, leaf_values,
+                 roots, max_depth, classes, n_features, source=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_index = leaf_index
+        self.leaf_values = leaf_values
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+        self.source = source or {}
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None, source=None):
+        """Flatten ``model``; merge ``scaler`` when given"""
+        import sklearn
+
+        # Since scikit-learn 1.4 tree values hold class fractions; before
+        # that they hold weighted counts that predict_proba normalises
+        normalize = tuple(int(p) for p in sklearn.__version__.split(".")[:2]) < (1, 4)
+
+        features, thresholds, children, leaves, values, roots = [], [], [], [], [], []
+        offset = n_leaves = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            ids = np.arange(n)
+            is_leaf = tree.children_left == -1
+
+            proba = tree.value[is_leaf, 0, :model.n_classes_].copy()
+            if normalize:
+                # Same normalisation as DecisionTreeClassifier.predict_proba
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+
+            left = np.where(is_leaf, ids, tree.children_left) + offset
+            right = np.where(is_leaf, ids, tree.children_right) + offset
+            leaf = np.full(n, -1, dtype=np.int32)
+            leaf[is_leaf] = np.arange(is_leaf.sum()) + n_leaves
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([left, right]))
+            leaves.append(leaf)
+            values.append(proba)
+            roots.append(offset)
+
+            offset += n
+            n_leaves += int(is_leaf.sum())
+            max_depth = max(max_depth, tree.max_depth)
+
+        # Index arrays are kept as intp so gathers need no conversion
+        feature = np.concatenate(features).astype(np.intp)
+        threshold = np.concatenate(thresholds)
+        split = np.isfinite(threshold)
+
+        if scaler is not None:
+            raw = np.full(len(threshold), np.inf, dtype=np.float32)
+            raw[split] = _raw_thresholds(scaler, feature[split], threshold[split])
+            threshold = raw
+        else:
+            # Trees compare float32(x) <= float64 t; the largest float32
+            # not above t gives the same decision in pure float32
+            t32 = threshold.astype(np.float32)
+            over = t32 > threshold
+            t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+            threshold = t32
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            children=np.concatenate(children).astype(np.intp).ravel(),
+            leaf_index=np.concatenate(leaves),
+            leaf_values=np.concatenate(values),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=model.classes_,
+            n_features=model.n_features_in_,
+            source=source
+        )
+
+    def apply(self, X, trees=slice(None)):
+        """Leaf node id reached in every tree (or the ``trees`` slice),
+        shape (n_rows, n_trees)"""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        base = (np.arange(len(X), dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        flat = X.ravel()
+
+        roots = self.roots[trees]
+        node = np.broadcast_to(roots, (len(X), len(roots)))
+        for _ in range(self.max_depth):
+            right = np.take(flat, base + np.take(self.feature, node)) > \
+                np.take(self.threshold, node)
+            node = np.take(self.children, 2 * node + right)
+        return node
+
+    def predict_proba(self, X):
+        leaves = np.take(self.leaf_values, np.take(self.leaf_index, self.apply(X)), axis=0)
+        # Sequential sum over trees, in the same order as the forest
+        proba = np.cumsum(leaves, axis=1)[:, -1]
+        proba /= len(self.roots)
+        return proba
+
+    def tree_proba(self, X, start, stop):
+        """Leaf probabilities of trees start..stop, shape (n_rows, n_trees, n_classes)"""
+        leaves = self.apply(X, slice(start, stop))
+        return np.take(self.leaf_values, np.take(self.leaf_index, leaves), axis=0)
+
+    def predict_proba_progressive(self, X, **kwargs):
+        """Early-exit ``predict_proba``; see progressive_proba"""
+        return progressive_proba(self.tree_proba, len(self.roots), X, **kwargs)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    @property
+    def nbytes(self):
+        return sum(
+            a.nbytes for a in (self.feature, self.threshold, self.children,
+                               self.leaf_index, self.leaf_values, self.roots)
+        )
+
+    def save(self, path=COMPILED_MODEL_PATH):
+        joblib.dump(self.__dict__, path)
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH, mmap_mode=None):
+        """Load an exported forest; mmap_mode="r" maps the arrays read-only"""
+        obj = cls.__new__(cls)
+        obj.__dict__.update(joblib.load(path, mmap_mode=mmap_mode))
+        return obj
+
+
+def is_compilable(model):
+    """Whether CompiledForest can flatten this estimator"""
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+    return isinstance(model, (RandomForestClassifier, ExtraTreesClassifier))
+
+
+def estimator_tree_proba(model):
+    """``tree_proba`` for a fitted sklearn forest taking scaled rows"""
+
+    def tree_proba(X, start, stop):
+        # The forest's own predict_proba validates once and skips it per tree
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return np.stack(
+            [e.predict_proba(X, check_input=False) for e in model.estimators_[start:stop]],
+            axis=1
+        )
+
+    return tree_proba
+
+
+def progressive_proba(tree_proba, n_trees, X, tolerance=0.01, chunk=25,
+                      min_trees=50, threshold=None, top=3):
+    """Average trees in chunks and stop each row once its ranking is decided.
+
+    After every ``chunk`` trees, a row stops when the order of its first
+    ``top`` classes is settled: each of them beats every class ranked below
+    it by a mean per-tree margin that is positive at error rate
+    ``tolerance`` (one-sided normal bound, with the finite-population
+    correction for the trees not yet evaluated). At the same error rate,
+    the probabilities of those ``top`` classes must also be within
+    ``tolerance`` of the full-forest value. With ``threshold`` the leader's
+    probability must also be clear of it, so decisions such as "uncertain"
+    do not flip. Trees of a forest are exchangeable, so the first n are a
+    fair sample of all of them.
+
+    ``tree_proba(X, start, stop)`` returns per-tree leaf probabilities.
+    Returns the probabilities averaged over the trees each row used, and
+    that count; rows that use every tree match ``predict_proba`` exactly.
+    """
+    X = np.atleast_2d(X)
+    z = NormalDist().inv_cdf(1 - tolerance) if tolerance > 0 else np.inf
+    leaves = None
+    used = np.zeros(len(X), dtype=np.intp)
+    active = np.arange(len(X))
+    n = 0
+
+    while len(active) and n < n_trees:
+        stop = min(n + chunk if n else max(min_trees, chunk), n_trees)
+        block = tree_proba(X[active], n, stop)
+        if leaves is None:
+            leaves = np.empty((len(X), n_trees, block.shape[2]))
+        leaves[active, n:stop] = block
+        n = used[active] = stop
+        if n == n_trees or z == np.inf:
+            continue
+
+        seen = leaves[active, :n]
+        fpc = np.sqrt((n_trees - n) / (n_trees - 1))
+        scale = z / np.sqrt(n) * fpc
+        order = np.argsort(seen.mean(axis=1), axis=1)[:, ::-1]
+        ranked = np.take_along_axis(seen, order[:, np.newaxis, :], axis=2)
+        decided = np.ones(len(active), dtype=bool)
+        for k in range(min(top, ranked.shape[2] - 1)):
+            # Per-tree margin of rank k over every class below it
+            margin = ranked[:, :, k:k + 1] - ranked[:, :, k + 1:]
+            bound = scale * margin.std(axis=1, ddof=1)
+            decided &= np.all(margin.mean(axis=1) > bound, axis=1)
+        shown = ranked[:, :, :top]
+        spread = scale * shown.std(axis=1, ddof=1)
+        decided &= np.all(spread <= tolerance, axis=1)
+        if threshold is not None:
+            decided &= np.abs(shown[:, :, 0].mean(axis=1) - threshold) > spread[:, 0]
+        active = active[~decided]
+
+    # Sequential sum over trees, in the same order as the forest
+    proba = np.empty((len(X), leaves.shape[2]))
+    for k in np.unique(used):
+        rows = np.flatnonzero(used == k)
+        proba[rows] = np.cumsum(leaves[rows, :k], axis=1)[:, -1] / k
+    return proba, used
+
+
+def artifact_source(model_path, scaler_path):
+    """Digests of the artifacts a compiled forest was built from"""
+    from src.utils.cache import file_digest
+
+    return {
+        "model": file_digest(model_path),
+        "scaler": file_digest(scaler_path)
+    }
+
+
+def export(model_path, scaler_path, out_path=COMPILED_MODEL_PATH):
+    source = artifact_source(model_path, scaler_path)
+    compiled = CompiledForest.from_sklearn(
+        joblib.load(model_path), joblib.load(scaler_path), source=source
+    )
+    compiled.save(out_path)
+    return compiled
+
+
+def load_or_compile(model_path, scaler_path, compiled_path=COMPILED_MODEL_PATH,
+                    mmap_mode=None):
+    """Use the exported forest if it was built from these artifacts.
+
+    Otherwise compile one in memory; returns None when the model is not a
+    forest. The estimator is only unpickled on that fallback path.
+    """
+    source = artifact_source(model_path, scaler_path)
+    if os.path.exists(compiled_path):
+        try:
+            compiled = CompiledForest.load(compiled_path, mmap_mode=mmap_mode)
+            if compiled.source == source:
+                return compiled
+        except Exception as e:
+            print("Compiled model unreadable, recompiling:", e)
+
+    model = joblib.load(model_path)
+    if not is_compilable(model):
+        print(f"{type(model).__name__} cannot be compiled, using sklearn")
+        return None
+
+    print("Compiling forest for the array backend...")
+    return CompiledForest.from_sklearn(model, joblib.load(scaler_path), source=source)
+
+
+if __name__ == "__main__":
+    model_path = os.path.join(MODELS_DIR, "model.pkl")
+    scaler_path = os.path.join(MODELS_DIR, "scaler.pkl")
+    export(model_path, scaler_path)
+    print("Compiled model saved to", COMPILED_MODEL_PATH)
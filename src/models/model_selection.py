@@ -0,0 +1,239 @@
+import time
+import pickle
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import (
+    GridSearchCV, RandomizedSearchCV, StratifiedGroupKFold, StratifiedKFold
+)
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.features.audio_features import FEATURE_GROUPS, group_columns
+from src.models.forest_engine import CompiledForest, is_compilable
+
+# (name, estimator class, parameters); every candidate sees the same scaled
+# features, so the list can grow without touching the trainer
+CANDIDATES = [
+    ("rf_300", RandomForestClassifier, {"n_estimators": 300}),
+    ("rf_150", RandomForestClassifier, {"n_estimators": 150}),
+    ("rf_60", RandomForestClassifier, {"n_estimators": 60}),
+    ("rf_60_depth12", RandomForestClassifier, {"n_estimators": 60, "max_depth": 12}),
+    ("rf_30_depth8", RandomForestClassifier, {"n_estimators": 30, "max_depth": 8}),
+    ("extra_trees_150", ExtraTreesClassifier, {"n_estimators": 150}),
+    ("logreg", LogisticRegression, {"C": 0.5, "max_iter": 2000})
+]
+
+# Settings shared by every candidate that accepts them
+COMMON_PARAMS = {"class_weight": "balanced", "random_state": 42}
+
+# Stage-one confidence thresholds (%) the cascade is reported at
+CASCADE_THRESHOLDS = (40, 50, 60, 70, 80, 90)
+
+# Hyperparameter spaces for the cross-validated search, by estimator
+SEARCH_SPACES = {
+    "random_forest": (RandomForestClassifier, {
+        "n_estimators": [60, 150, 300],
+        "max_depth": [None, 12, 20],
+        "min_samples_leaf": [1, 2, 4],
+        "max_features": ["sqrt", "log2", 0.3]
+    }),
+    "extra_trees": (ExtraTreesClassifier, {
+        "n_estimators": [150, 300],
+        "max_depth": [None, 20],
+        "min_samples_leaf": [1, 2],
+        "max_features": ["sqrt", 0.3]
+    }),
+    "logreg": (LogisticRegression, {
+        "C": [0.05, 0.1, 0.5, 1.0, 5.0],
+        "max_iter": [2000]
+    })
+}
+
+
+def build_candidate(cls, params):
+    accepted = cls().get_params()
+    common = {k: v for k, v in COMMON_PARAMS.items() if k in accepted}
+    return cls(**common, **params)
+
+
+def _median_ms(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def measure_latency(model, X, backend="sklearn", repeats=30):
+    """Median single-row and per-row batch predict_proba latency in ms.
+
+    ``X`` is in the model's input space (already scaled). With the
+    "compiled" backend forests are timed through CompiledForest, which is
+    what the app runs; other estimators fall back to sklearn.
+    """
+    predict = model.predict_proba
+    if backend == "compiled" and is_compilable(model):
+        predict = CompiledForest.from_sklearn(model).predict_proba
+
+    X = np.asarray(X, dtype=np.float32)
+    predict(X[:1])  # warm-up
+    row_ms = _median_ms(lambda: predict(X[:1]), repeats)
+    batch_ms = _median_ms(lambda: predict(X), max(3, repeats // 10))
+    return row_ms, batch_ms / len(X)
+
+
+def model_size_kb(model):
+    return len(pickle.dumps(model)) / 1024
+
+
+def evaluate_candidate(name, model, X_fit, y_fit, X_val, y_val, backend="sklearn"):
+    start = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+
+    y_pred = model.predict(X_val)
+    row_ms, batch_row_ms = measure_latency(model, X_val, backend)
+    return {
+        "name": name,
+        "accuracy": round(accuracy_score(y_val, y_pred) * 100, 2),
+        "f1": round(f1_score(y_val, y_pred, average="weighted") * 100, 2),
+        "row_latency_ms": round(row_ms, 3),
+        "batch_latency_ms_per_row": round(batch_row_ms, 4),
+        "size_kb": round(model_size_kb(model), 1),
+        "fit_seconds": round(fit_seconds, 2)
+    }
+
+
+def pareto_front(results):
+    """Names of candidates not beaten on both F1 and single-row latency"""
+    front = []
+    for r in results:
+        dominated = any(
+            o["f1"] >= r["f1"] and o["row_latency_ms"] <= r["row_latency_ms"]
+            and (o["f1"] > r["f1"] or o["row_latency_ms"] < r["row_latency_ms"])
+            for o in results
+        )
+        if not dominated:
+            front.append(r["name"])
+    return front
+
+
+def select_candidate(results, latency_budget_ms=None):
+    """Best F1 within the latency budget; the fastest model if none fits"""
+    within = [
+        r for r in results
+        if latency_budget_ms is None or r["row_latency_ms"] <= latency_budget_ms
+    ]
+    if not within:
+        print(f"No candidate meets the {latency_budget_ms} ms budget, "
+              "using the fastest one")
+        return min(results, key=lambda r: r["row_latency_ms"])
+    return max(within, key=lambda r: (r["f1"], r["accuracy"], -r["row_latency_ms"]))
+
+
+def evaluate_cascade(proba_one, proba_two, y_true, stage_one_ms, stage_two_ms,
+                     thresholds=CASCADE_THRESHOLDS):
+    """Escalation share, accuracy and expected latency of a two-stage cascade.
+
+    A clip escalates to stage two when its stage-one confidence (%) is below
+    the threshold. Every clip pays ``stage_one_ms``; escalated clips also pay
+    ``stage_two_ms``.
+    """
+    confidence = proba_one.max(axis=1) * 100
+    results = []
+    for threshold in thresholds:
+        escalate = confidence < threshold
+        y_pred = np.where(escalate, proba_two.argmax(axis=1), proba_one.argmax(axis=1))
+        results.append({
+            "threshold": threshold,
+            "escalated": round(float(escalate.mean()) * 100, 2),
+            "accuracy": round(accuracy_score(y_true, y_pred) * 100, 2),
+            "f1": round(f1_score(y_true, y_pred, average="weighted") * 100, 2),
+            "latency_ms": round(stage_one_ms + float(escalate.mean()) * stage_two_ms, 2)
+        })
+    return results
+
+
+def group_importance(model, groups=FEATURE_GROUPS):
+    """Share of impurity importance per feature group (forests only)"""
+    if not hasattr(model, "feature_importances_"):
+        return {}
+    importances = model.feature_importances_
+    return {
+        g: round(float(importances[group_columns((g,))].sum()) * 100, 2)
+        for g in groups
+    }
+
+
+def group_ablation(cls, params, X_fit, y_fit, X_val, y_val, groups=FEATURE_GROUPS):
+    """Validation accuracy and F1 lost when each group is left out.
+
+    ``X_fit``/``X_val`` hold the full, already scaled feature vectors;
+    standardisation is per column, so dropping columns needs no refit of
+    the scaler.
+    """
+    def scores(columns):
+        model = build_candidate(cls, params)
+        model.fit(X_fit[:, columns], y_fit)
+        y_pred = model.predict(X_val[:, columns])
+        return (accuracy_score(y_val, y_pred) * 100,
+                f1_score(y_val, y_pred, average="weighted") * 100)
+
+    base_acc, base_f1 = scores(group_columns(groups))
+    results = {}
+    for group in groups:
+        acc, f1 = scores(group_columns([g for g in groups if g != group]))
+        results[group] = {
+            "accuracy_drop": round(base_acc - acc, 2),
+            "f1_drop": round(base_f1 - f1, 2)
+        }
+    return results
+
+
+def search_hyperparameters(X, y, space, groups=None, method="random", n_iter=20,
+                           folds=5, n_jobs=-1):
+    """Cross-validated search over one of SEARCH_SPACES.
+
+    ``X`` is the raw feature matrix, read once from the feature store; the
+    scaler is refit inside every fold so no statistics leak from the
+    held-out part. With ``groups`` (e.g. RAVDESS actors) no group is split
+    across folds, so scores reflect unseen speakers. Trials x folds run in
+    parallel on ``n_jobs`` cores. Returns (best params, per-trial results).
+    """
+    cls, grid = SEARCH_SPACES[space]
+    pipeline = Pipeline([("scaler", StandardScaler()), ("model", build_candidate(cls, {}))])
+    grid = {f"model__{k}": v for k, v in grid.items()}
+
+    if groups is not None:
+        folds = min(folds, len(set(groups)))
+        cv = StratifiedGroupKFold(n_splits=folds, shuffle=True, random_state=42)
+    else:
+        cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+
+    options = dict(
+        scoring={"f1": "f1_weighted", "accuracy": "accuracy"}, refit=False,
+        cv=cv, n_jobs=n_jobs
+    )
+    if method == "grid":
+        search = GridSearchCV(pipeline, grid, **options)
+    else:
+        search = RandomizedSearchCV(pipeline, grid, n_iter=n_iter, random_state=42, **options)
+    search.fit(X, y, groups=groups)
+
+    res = search.cv_results_
+    trials = []
+    for i, params in enumerate(res["params"]):
+        trials.append({
+            "params": {k.replace("model__", ""): v for k, v in params.items()},
+            "f1": round(float(res["mean_test_f1"][i]) * 100, 2),
+            "f1_std": round(float(res["std_test_f1"][i]) * 100, 2),
+            "accuracy": round(float(res["mean_test_accuracy"][i]) * 100, 2),
+            "fit_seconds": round(float(res["mean_fit_time"][i]), 3),
+            "score_seconds": round(float(res["mean_score_time"][i]), 3),
+            "rank": int(res["rank_test_f1"][i])
+        })
+    trials.sort(key=lambda t: t["rank"])
+    return trials[0]["params"], trials
@@ -1,28 +1,68 @@
 import os
 import sys
 import json
+import time
 import joblib
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
 sys.path.insert(0, PROJECT_ROOT)
 
-from src.features.audio_features import AudioFeatureExtractor
+from src.features.audio_features import (
+    FEATURE_GROUPS, FEATURE_PROFILES, AudioFeatureExtractor, group_columns
+)
+from src.features.feature_store import FeatureStore
+from src.features.parallel import default_workers, extract_files, parallel_map_chunks
+from src.models.forest_engine import export as export_compiled
+from src.models.model_selection import (
+    CANDIDATES, SEARCH_SPACES, build_candidate, evaluate_candidate,
+    evaluate_cascade, group_ablation, group_importance, is_compilable, measure_latency,
+    model_size_kb, pareto_front, search_hyperparameters, select_candidate
+)
 
 MODELS_DIR = os.path.join(PROJECT_ROOT, "models")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+FEATURE_STORE_PATH = os.path.join(MODELS_DIR, "feature_store.pkl")
+
+# model.pkl goes last: the app reloads every artifact when its digest changes
+ARTIFACTS = (
+    "scaler.pkl", "label_encoder.pkl", "model_compiled.pkl",
+    "model_metrics.json", "model.pkl"
+)
+
+
+def profile_dir(profile):
+    """The "full" profile lives in models/, others in models/profiles/<name>/"""
+    if profile == "full":
+        return MODELS_DIR
+    return os.path.join(MODELS_DIR, "profiles", profile)
+
 class SERModelTrainer:
-    def __init__(self, dataset_path):
+    def __init__(self, dataset_path, n_jobs=None, feature_store_path=FEATURE_STORE_PATH,
+                 candidates=CANDIDATES, latency_budget_ms=None,
+                 inference_backend="sklearn", profiles=FEATURE_PROFILES,
+                 cost_sample=20, cascade_profile="cheap"):
         self.dataset_path = dataset_path
+        # Profile used as stage one of the cheap-first cascade (None: no report)
+        self.cascade_profile = cascade_profile if cascade_profile in profiles else None
+        self.n_jobs = n_jobs or default_workers()
+        self.candidates = candidates
+        self.profiles = profiles
+        self.cost_sample = cost_sample
+        self.latency_budget_ms = latency_budget_ms
+        self.inference_backend = inference_backend
         self.extractor = AudioFeatureExtractor(16000)
         self.scaler = StandardScaler()
         self.encoder = LabelEncoder()
+        self.feature_store = (
+            FeatureStore(feature_store_path, self.extractor.version)
+            if feature_store_path else None
+        )
 
     def _label_from_filename(self, name):
         code = int(name.split("-")[2])
@@ -38,62 +78,339 @@ class SERModelTrainer:
         }
         return mapping.get(code)
 
-    def load_data(self):
-        X, y = [], []
-        for actor in os.listdir(self.dataset_path):
+    def _actor_from_filename(self, name):
+        # RAVDESS: the last field is the actor id
+        return int(os.path.splitext(name)[0].split("-")[-1])
+
+    def _dataset_files(self):
+        files = []
+        for actor in sorted(os.listdir(self.dataset_path)):
             actor_dir = os.path.join(self.dataset_path, actor)
             if not os.path.isdir(actor_dir):
                 continue
-            for file in os.listdir(actor_dir):
+            for file in sorted(os.listdir(actor_dir)):
                 if file.endswith(".wav"):
-                    path = os.path.join(actor_dir, file)
-                    feat = self.extractor.extract(path)
-                    label = self._label_from_filename(file)
-                    if feat is not None and label:
-                        X.append(feat)
-                        y.append(label)
+                    files.append(os.path.join(actor_dir, file))
+        return files
+
+    def _extract_all(self, paths):
+        features = {}
+        pending = []
+        for path in paths:
+            found, feat = (
+                self.feature_store.get(path) if self.feature_store else (False, None)
+            )
+            if found:
+                features[path] = feat
+            else:
+                pending.append(path)
+
+        print(f"Extracting features: {len(pending)} new/changed, "
+              f"{len(paths) - len(pending)} cached")
+
+        # Each worker extracts a chunk of files per task
+        for path, feat in parallel_map_chunks(extract_files, pending, self.n_jobs):
+            features[path] = feat
+            if self.feature_store:
+                self.feature_store.put(path, feat)
+
+        if self.feature_store:
+            self.feature_store.retain(paths)
+            self.feature_store.save()
+
+        return features
+
+    def _labelled_files(self):
+        return [
+            p for p in self._dataset_files()
+            if self._label_from_filename(os.path.basename(p))
+        ]
+
+    def load_data(self, with_actors=False):
+        X, y, actors = [], [], []
+        paths = self._labelled_files()
+        features = self._extract_all(paths)
+        for path in paths:
+            feat = features[path]
+            if feat is not None:
+                X.append(feat)
+                y.append(self._label_from_filename(os.path.basename(path)))
+                actors.append(self._actor_from_filename(os.path.basename(path)))
+        if with_actors:
+            return np.array(X), np.array(y), np.array(actors)
         return np.array(X), np.array(y)
 
-    def train(self):
-        print("Loading dataset...")
-        X, y = self.load_data()
+    def extraction_cost(self, paths, extra_profiles=None):
+        """Median extraction ms per clip, per feature group and per profile
+        (plus ``extra_profiles``, name -> groups).
 
-        y_enc = self.encoder.fit_transform(y)
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y_enc, test_size=0.2, stratify=y_enc, random_state=42
+        Shared STFT/HPSS work is charged to the first group that uses it,
+        so HPSS shows up under tonnetz.
+        """
+        import librosa
+
+        step = max(1, len(paths) // self.cost_sample)
+        clips = [librosa.load(p, sr=16000, mono=True)[0] for p in paths[::step][:self.cost_sample]]
+
+        group_ms = {g: [] for g in FEATURE_GROUPS}
+        timed = AudioFeatureExtractor(
+            16000, group_hook=lambda g, sec: group_ms[g].append(sec * 1000)
         )
+        for y in clips:
+            timed.extract_from_array(y)
 
-        X_train = self.scaler.fit_transform(X_train)
-        X_test = self.scaler.transform(X_test)
+        profile_ms = {}
+        for name, groups in {**self.profiles, **(extra_profiles or {})}.items():
+            extractor = AudioFeatureExtractor(16000, groups=groups)
+            times = []
+            for y in clips:
+                start = time.perf_counter()
+                extractor.extract_from_array(y)
+                times.append((time.perf_counter() - start) * 1000)
+            profile_ms[name] = round(float(np.median(times)), 2)
 
-        model = RandomForestClassifier(
-            n_estimators=300,
-            class_weight="balanced",
-            random_state=42
+        return (
+            {g: round(float(np.median(ms)), 2) for g, ms in group_ms.items() if ms},
+            profile_ms
         )
-        model.fit(X_train, y_train)
 
-        y_pred = model.predict(X_test)
+    def select_model(self, X_train, y_train):
+        """Compare candidates on a validation split of the training data"""
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train, test_size=0.25, stratify=y_train, random_state=42
+        )
+
+        results = []
+        for name, cls, params in self.candidates:
+            print(f"Evaluating candidate {name}...")
+            results.append(evaluate_candidate(
+                name, build_candidate(cls, params),
+                X_fit, y_fit, X_val, y_val, self.inference_backend
+            ))
+
+        front = pareto_front(results)
+        chosen = select_candidate(results, self.latency_budget_ms)
+        print(f"Selected {chosen['name']} (F1 {chosen['f1']}%, "
+              f"{chosen['row_latency_ms']} ms/row); Pareto front: {', '.join(front)}")
+        return chosen["name"], results, front
+
+    def search(self, spaces=None, method="random", n_iter=20, folds=5,
+               group_by_actor=True):
+        """Cross-validated hyperparameter search on the cached features.
+
+        Features come from the feature store once; every trial and fold
+        reuses the same matrix. Results go to models/search_results.json
+        and the winner replaces the trainer's candidates, so a following
+        train() fits it on the usual split.
+        """
+        print("Loading dataset...")
+        X, y, actors = self.load_data(with_actors=True)
+        y_enc = self.encoder.fit_transform(y)
+        groups = actors if group_by_actor else None
+
+        start = time.perf_counter()
+        results = {}
+        for space in spaces or SEARCH_SPACES:
+            print(f"Searching {space} ({method}, {folds} folds"
+                  f"{', grouped by actor' if group_by_actor else ''})...")
+            best, trials = search_hyperparameters(
+                X, y_enc, space, groups, method, n_iter, folds, self.n_jobs
+            )
+            results[space] = {"best_params": best, "trials": trials}
+            print(f"  best F1 {trials[0]['f1']}% ± {trials[0]['f1_std']} with {best}")
+
+        winner = max(results, key=lambda s: results[s]["trials"][0]["f1"])
+        summary = {
+            "method": method,
+            "n_iter": n_iter if method == "random" else None,
+            "folds": min(folds, len(set(actors))) if group_by_actor else folds,
+            "group_by_actor": group_by_actor,
+            "samples": len(X),
+            "seconds": round(time.perf_counter() - start, 2),
+            "best": {"space": winner, **results[winner]["trials"][0]},
+            "spaces": results
+        }
+        with open(os.path.join(MODELS_DIR, "search_results.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Search finished in {summary['seconds']}s; best: {winner} "
+              f"{results[winner]['best_params']}")
+
+        self.candidates = [
+            (f"search_{winner}", SEARCH_SPACES[winner][0], results[winner]["best_params"])
+        ]
+        return summary
 
-        metrics = {
+    def _evaluate(self, model, X_test, y_test):
+        y_pred = model.predict(X_test)
+        row_ms, batch_row_ms = measure_latency(model, X_test, self.inference_backend)
+        return {
             "accuracy": round(accuracy_score(y_test, y_pred) * 100, 2),
             "f1": round(f1_score(y_test, y_pred, average="weighted") * 100, 2),
             "precision": round(precision_score(y_test, y_pred, average="weighted") * 100, 2),
             "recall": round(recall_score(y_test, y_pred, average="weighted") * 100, 2),
             "classes": self.encoder.classes_.tolist(),
-            "features": X.shape[1]
+            "features": X_test.shape[1],
+            "row_latency_ms": round(row_ms, 3),
+            "batch_latency_ms_per_row": round(batch_row_ms, 4),
+            "size_kb": round(model_size_kb(model), 1)
         }
 
-        joblib.dump(model, os.path.join(MODELS_DIR, "model.pkl"))
-        joblib.dump(self.scaler, os.path.join(MODELS_DIR, "scaler.pkl"))
-        joblib.dump(self.encoder, os.path.join(MODELS_DIR, "label_encoder.pkl"))
+    def _save(self, out_dir, model, scaler, metrics):
+        """Write every artifact next to its target, then rename them into
+        place with model.pkl last, so a running app never loads a partial
+        file or a new model with an old scaler"""
+        os.makedirs(out_dir, exist_ok=True)
+        staged = {name: os.path.join(out_dir, f".{name}.tmp") for name in ARTIFACTS}
+        joblib.dump(model, staged["model.pkl"])
+        joblib.dump(scaler, staged["scaler.pkl"])
+        joblib.dump(self.encoder, staged["label_encoder.pkl"])
+
+        # Array-backed copy of the forest for SER_INFERENCE_BACKEND=compiled
+        if is_compilable(model):
+            export_compiled(
+                staged["model.pkl"], staged["scaler.pkl"], staged["model_compiled.pkl"]
+            )
 
-        with open(os.path.join(MODELS_DIR, "model_metrics.json"), "w") as f:
+        with open(staged["model_metrics.json"], "w") as f:
             json.dump(metrics, f, indent=2)
 
+        for name in ARTIFACTS:
+            if os.path.exists(staged[name]):
+                os.replace(staged[name], os.path.join(out_dir, name))
+
+    def _cascade_report(self, proba_one, proba_two, y_test, one_metrics, two_metrics,
+                        profile_ms):
+        """Cascade results on the test split, one entry per threshold"""
+        stage_one_ms = profile_ms[self.cascade_profile] + one_metrics["row_latency_ms"]
+        stage_two_ms = profile_ms["cascade_stage_two"] + two_metrics["row_latency_ms"]
+        thresholds = evaluate_cascade(proba_one, proba_two, y_test, stage_one_ms, stage_two_ms)
+
+        print(f"Cascade {self.cascade_profile} -> full "
+              f"(full: {two_metrics['accuracy']}% accuracy, "
+              f"{profile_ms['full'] + two_metrics['row_latency_ms']:.1f} ms/clip):")
+        for r in thresholds:
+            print(f"  below {r['threshold']}%: {r['escalated']}% escalated, "
+                  f"{r['accuracy']}% accuracy, {r['latency_ms']} ms/clip")
+        return {
+            "stage_one_profile": self.cascade_profile,
+            "stage_one_ms": round(stage_one_ms, 2),
+            "stage_two_ms": round(stage_two_ms, 2),
+            "full_ms": round(profile_ms["full"] + two_metrics["row_latency_ms"], 2),
+            "thresholds": thresholds
+        }
+
+    def train(self):
+        print("Loading dataset...")
+        X, y = self.load_data()
+
+        y_enc = self.encoder.fit_transform(y)
+        X_train_raw, X_test_raw, y_train, y_test = train_test_split(
+            X, y_enc, test_size=0.2, stratify=y_enc, random_state=42
+        )
+
+        X_train = self.scaler.fit_transform(X_train_raw)
+        X_test = self.scaler.transform(X_test_raw)
+
+        selected, candidates, front = self.select_model(X_train, y_train)
+        _, cls, params = next(c for c in self.candidates if c[0] == selected)
+
+        model = build_candidate(cls, params)
+        model.fit(X_train, y_train)
+
+        # Per-group evidence for choosing a profile: importance in the
+        # selected model, validation cost of dropping the group, and the
+        # group's share of extraction time
+        print("Analysing feature groups...")
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train, test_size=0.25, stratify=y_train, random_state=42
+        )
+        importance = group_importance(model)
+        ablation = group_ablation(cls, params, X_fit, y_fit, X_val, y_val)
+        # Cascade stage two extracts only the groups stage one skipped
+        stage_two = {}
+        if self.cascade_profile:
+            stage_two["cascade_stage_two"] = tuple(
+                g for g in FEATURE_GROUPS if g not in self.profiles[self.cascade_profile]
+            )
+        group_ms, profile_ms = self.extraction_cost(self._labelled_files(), stage_two)
+        feature_groups = {
+            g: {
+                "features": len(group_columns((g,))),
+                "importance": importance.get(g),
+                **ablation[g],
+                "extract_ms": group_ms.get(g)
+            }
+            for g in FEATURE_GROUPS
+        }
+
+        common = {
+            "model": selected,
+            "model_params": params,
+            "inference_backend": self.inference_backend,
+            "latency_budget_ms": self.latency_budget_ms
+        }
+        profiles = {}
+        stage_one = None
+        for name, groups in self.profiles.items():
+            if name == "full":
+                continue
+            print(f"Training profile {name} ({'+'.join(groups)})...")
+            columns = group_columns(groups)
+            scaler = StandardScaler()
+            p_train = scaler.fit_transform(X_train_raw[:, columns])
+            p_model = build_candidate(cls, params)
+            p_model.fit(p_train, y_train)
+
+            p_metrics = self._evaluate(p_model, scaler.transform(X_test_raw[:, columns]), y_test)
+            p_metrics.update(common, feature_profile=name, feature_groups=list(groups),
+                             extract_ms=profile_ms[name])
+            self._save(profile_dir(name), p_model, scaler, p_metrics)
+            profiles[name] = p_metrics
+            if name == self.cascade_profile:
+                stage_one = p_model.predict_proba(scaler.transform(X_test_raw[:, columns]))
+
+        metrics = self._evaluate(model, X_test, y_test)
+        metrics.update(
+            common,
+            # Candidate scores come from a validation split of the training set
+            candidates=candidates,
+            pareto_front=front,
+            feature_profile="full",
+            feature_groups=feature_groups,
+            extract_ms=profile_ms.get("full"),
+            profiles={
+                name: {k: m[k] for k in ("feature_groups", "features", "accuracy",
+                                         "f1", "row_latency_ms", "extract_ms")}
+                for name, m in profiles.items()
+            }
+        )
+        if stage_one is not None:
+            metrics["cascade"] = self._cascade_report(
+                stage_one, model.predict_proba(X_test), y_test,
+                profiles[self.cascade_profile], metrics, profile_ms
+            )
+        self._save(MODELS_DIR, model, self.scaler, metrics)
+
         print("Training completed")
         print(metrics)
 
 if __name__ == "__main__":
     DATASET_DIR = os.path.join(PROJECT_ROOT, "dataset")
-    SERModelTrainer(DATASET_DIR).train()
+    budget = os.environ.get("SER_LATENCY_BUDGET_MS")
+    trainer = SERModelTrainer(
+        DATASET_DIR,
+        latency_budget_ms=float(budget) if budget else None,
+        inference_backend=os.environ.get("SER_INFERENCE_BACKEND", "sklearn")
+    )
+
+    # SER_SEARCH=random|grid runs a cross-validated search first and
+    # trains its winner instead of the fixed candidates
+    search = os.environ.get("SER_SEARCH")
+    if search:
+        trainer.search(
+            method=search,
+            n_iter=int(os.environ.get("SER_SEARCH_ITER", 20)),
+            folds=int(os.environ.get("SER_CV_FOLDS", 5)),
+            group_by_actor=os.environ.get("SER_CV_GROUP_BY_ACTOR", "1") not in ("0", "false", "no")
+        )
+    trainer.train()
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import shutil
+import joblib
+import numpy as np
+from sklearn.base import clone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.features.audio_features import FEATURE_PROFILES, AudioFeatureExtractor, group_columns
+from src.models.feedback import FeedbackStore
+from src.models.forest_engine import export as export_compiled, is_compilable
+from src.models.model_selection import model_size_kb
+from src.models.trainer import ARTIFACTS, SERModelTrainer, profile_dir
+from src.utils.cache import file_digest
+
+
+def publish(version_dir, live_dir):
+    """Copy a saved version over the live artifacts.
+
+    Every file is copied next to its target and renamed into place, so no
+    reader sees a partial file. A running app only re-reads the artifacts
+    when model.pkl changes, and that file is swapped last, so it always
+    loads a matching set.
+    """
+    for name in ARTIFACTS:
+        src = os.path.join(version_dir, name)
+        if not os.path.exists(src):
+            continue
+        tmp = os.path.join(live_dir, f".{name}.tmp")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, os.path.join(live_dir, name))
+
+    with open(os.path.join(versions_dir(live_dir), "CURRENT"), "w") as f:
+        f.write(os.path.basename(version_dir) + "\n")
+
+
+def versions_dir(live_dir):
+    path = os.path.join(live_dir, "versions")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def snapshot(live_dir, name):
+    """Save the live artifacts as a version (so an update can be rolled back)"""
+    out = os.path.join(versions_dir(live_dir), name)
+    if not os.path.exists(out):
+        os.makedirs(out)
+        for artifact in ARTIFACTS:
+            src = os.path.join(live_dir, artifact)
+            if os.path.exists(src):
+                shutil.copyfile(src, os.path.join(out, artifact))
+    return out
+
+
+def _new_version_id(model_path):
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + file_digest(model_path)[:8]
+
+
+def update_from_feedback(dataset_path, profile="full", mode="grow", growth=20,
+                         feedback_weight=5.0, min_samples=1):
+    """Fold stored feedback into the live model without re-extracting.
+
+    ``mode="grow"`` adds ``growth`` trees to a forest with warm_start,
+    trained on the cached dataset features plus the feedback samples
+    (weighted by ``feedback_weight``); the existing trees are kept.
+    ``mode="refit"`` (and any non-forest model) refits the same estimator
+    on that data instead: forests from scratch, linear models from their
+    current coefficients. The scaler is kept, so existing trees stay
+    valid. The result is saved as a new version and published.
+    """
+    live_dir = profile_dir(profile)
+    groups = FEATURE_PROFILES[profile]
+    version = AudioFeatureExtractor(16000, groups=groups).version
+
+    X_fb, labels = FeedbackStore().load(version)
+    model = joblib.load(os.path.join(live_dir, "model.pkl"))
+    scaler = joblib.load(os.path.join(live_dir, "scaler.pkl"))
+    encoder = joblib.load(os.path.join(live_dir, "label_encoder.pkl"))
+
+    known = np.isin(labels, encoder.classes_)
+    X_fb, labels = X_fb[known], labels[known]
+    if len(X_fb) < min_samples:
+        print(f"Only {len(X_fb)} feedback samples for profile {profile}, nothing to do")
+        return None
+
+    start = time.perf_counter()
+    # The dataset features come from the feature store, not from audio
+    trainer = SERModelTrainer(dataset_path)
+    X, y = trainer.load_data()
+    X = X[:, group_columns(groups)]
+
+    X_all = scaler.transform(np.vstack([X, X_fb]))
+    y_all = encoder.transform(np.concatenate([y, labels]))
+    weights = np.concatenate([np.ones(len(X)), np.full(len(X_fb), feedback_weight)])
+    X_fb_scaled = scaler.transform(X_fb)
+    y_fb = encoder.transform(labels)
+    before = float(np.mean(model.predict(X_fb_scaled) == y_fb) * 100)
+
+    params = model.get_params()
+    grow = mode == "grow" and is_compilable(model)
+    if grow:
+        model.set_params(warm_start=True, n_estimators=params["n_estimators"] + growth)
+    elif is_compilable(model):
+        # A warm-started forest with the same n_estimators fits no new
+        # trees, so a refit starts from a fresh copy
+        model = clone(model)
+    elif "warm_start" in params:
+        # Linear models continue the same optimisation from their current
+        # coefficients
+        model.set_params(warm_start=True)
+    model.fit(X_all, y_all, sample_weight=weights)
+    model.set_params(warm_start=False)
+
+    after = float(np.mean(model.predict(X_fb_scaled) == y_fb) * 100)
+    seconds = time.perf_counter() - start
+
+    # Keep the current artifacts as a version before the first update
+    versions = versions_dir(live_dir)
+    if not any(os.path.isdir(os.path.join(versions, v)) for v in os.listdir(versions)):
+        snapshot(live_dir, _new_version_id(os.path.join(live_dir, "model.pkl")) + "-base")
+
+    staging = os.path.join(versions, ".staging")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    model_path = os.path.join(staging, "model.pkl")
+    scaler_path = os.path.join(staging, "scaler.pkl")
+    joblib.dump(model, model_path)
+    shutil.copyfile(os.path.join(live_dir, "scaler.pkl"), scaler_path)
+    shutil.copyfile(os.path.join(live_dir, "label_encoder.pkl"),
+                    os.path.join(staging, "label_encoder.pkl"))
+    if is_compilable(model):
+        export_compiled(model_path, scaler_path, os.path.join(staging, "model_compiled.pkl"))
+    version_id = _new_version_id(model_path)
+
+    with open(os.path.join(live_dir, "model_metrics.json")) as f:
+        metrics = json.load(f)
+    new_params = {k: v for k, v in model.get_params().items() if k in metrics.get("model_params", {})}
+    metrics["model_params"] = {**metrics.get("model_params", {}), **new_params}
+    metrics["size_kb"] = round(model_size_kb(model), 1)
+    metrics["update"] = {
+        "mode": "grow" if grow else "refit",
+        "feedback_samples": int(len(X_fb)),
+        "feedback_weight": feedback_weight,
+        "trees_added": growth if grow else 0,
+        "feedback_accuracy_before": round(before, 2),
+        "feedback_accuracy_after": round(after, 2),
+        "seconds": round(seconds, 2),
+        "version": version_id
+    }
+    with open(os.path.join(staging, "model_metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+
+    version_dir = os.path.join(versions, version_id)
+    os.replace(staging, version_dir)
+    publish(version_dir, live_dir)
+
+    print(f"Published {version_id}: {len(X_fb)} feedback samples, "
+          f"feedback accuracy {before:.1f}% -> {after:.1f}% in {seconds:.1f}s")
+    return metrics["update"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Update the model from user feedback")
+    parser.add_argument("--profile", choices=sorted(FEATURE_PROFILES), default="full")
+    parser.add_argument("--mode", choices=["grow", "refit"], default="grow")
+    parser.add_argument("--growth", type=int, default=20, help="trees added in grow mode")
+    parser.add_argument("--feedback-weight", type=float, default=5.0)
+    parser.add_argument("--min-samples", type=int, default=1)
+    parser.add_argument("--rollback", metavar="VERSION",
+                        help="publish a saved version instead of updating")
+    args = parser.parse_args()
+
+    if args.rollback:
+        live_dir = profile_dir(args.profile)
+        publish(os.path.join(versions_dir(live_dir), args.rollback), live_dir)
+        print("Published", args.rollback)
+    else:
+        update_from_feedback(
+            os.path.join(PROJECT_ROOT, "dataset"), args.profile, args.mode,
+            args.growth, args.feedback_weight, args.min_samples
+        )
@@ -0,0 +1,137 @@
+"""
+Audio decoding helpers for SER application
+Decodes uploads once into a float32 mono array shared by every pipeline stage
+"""
+
+import tempfile
+import subprocess
+
+import numpy as np
+import soundfile as sf
+from pydub import AudioSegment
+
+TARGET_SAMPLE_RATE = 16000
+
+
+# librosa res_type used to reach TARGET_SAMPLE_RATE; "soxr_lq" is cheaper
+DEFAULT_RESAMPLE_QUALITY = "soxr_hq"
+
+# Leading bytes of the containers libsndfile reads natively
+_SOUNDFILE_MAGIC = (
+    (0, b"RIFF", 8, b"WAVE"),
+    (0, b"RIFX", 8, b"WAVE"),
+    (0, b"fLaC", None, None),
+    (0, b"OggS", None, None),
+    (0, b"FORM", 8, b"AIFF"),
+    (0, b"FORM", 8, b"AIFC")
+)
+
+
+def sniff_soundfile(source):
+    """Whether the file (path or binary file object) is WAV/FLAC/OGG/AIFF"""
+    if hasattr(source, "read"):
+        pos = source.tell()
+        head = source.read(12)
+        source.seek(pos)
+    else:
+        with open(source, "rb") as f:
+            head = f.read(12)
+
+    return any(
+        head[o1:o1 + len(m1)] == m1 and (m2 is None or head[o2:o2 + len(m2)] == m2)
+        for o1, m1, o2, m2 in _SOUNDFILE_MAGIC
+    )
+
+
+def resample(y, orig_sr, sample_rate=TARGET_SAMPLE_RATE,
+             quality=DEFAULT_RESAMPLE_QUALITY):
+    if orig_sr == sample_rate:
+        return y
+    import librosa
+
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=sample_rate, res_type=quality)
+
+
+def _read_soundfile(source):
+    try:
+        data, sr = sf.read(source, dtype="float32", always_2d=True)
+    except RuntimeError:
+        # Sniffed as a soundfile container but unreadable (e.g. an odd codec)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return None
+    return data.mean(axis=1) if data.shape[1] > 1 else data[:, 0], sr
+
+
+def _read_ffmpeg(source):
+    segment = AudioSegment.from_file(source).set_channels(1)
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    # Same scaling soundfile applies when librosa reads integer PCM
+    return samples / float(1 << (8 * segment.sample_width - 1)), segment.frame_rate
+
+
+def decode_audio(file_path, sample_rate=TARGET_SAMPLE_RATE,
+                 quality=DEFAULT_RESAMPLE_QUALITY):
+    """Decode an upload into a float32 mono array at ``sample_rate``.
+
+    WAV/FLAC/OGG/AIFF are read in-process with soundfile; only other
+    containers (webm, m4a, mp3, ...) spawn ffmpeg. Resampling uses the
+    librosa resampler ``quality`` and is skipped when the rate matches.
+    """
+    decoded = _read_soundfile(file_path) if sniff_soundfile(file_path) else None
+    if decoded is None:
+        decoded = _read_ffmpeg(file_path)
+
+    y, sr = decoded
+    return resample(y, sr, sample_rate, quality)
+
+
+def iter_audio_blocks(file_path, sample_rate=TARGET_SAMPLE_RATE, block_seconds=30):
+    """Decode a file block by block through ffmpeg, never holding it whole.
+
+    Raises RuntimeError with ffmpeg's message when decoding fails, and
+    OSError when ffmpeg cannot be started.
+    """
+    cmd = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-i", file_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"
+    ]
+    block_bytes = int(block_seconds * sample_rate) * 2
+    # stderr goes to a file: an unread pipe fills up with warnings and
+    # blocks ffmpeg while stdout is being drained
+    errors = tempfile.TemporaryFile()
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+    except OSError:
+        errors.close()
+        raise
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            pcm = np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+            yield pcm.astype(np.float32) / 32768.0
+
+        if proc.wait() != 0:
+            errors.seek(0)
+            raise RuntimeError(errors.read().decode(errors="replace").strip())
+    finally:
+        # The consumer may stop early; don't leave ffmpeg blocked on a pipe
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        errors.close()
+
+
+def to_pcm16(y):
+    """Convert a float array in [-1, 1] to 16-bit PCM bytes"""
+    pcm = np.clip(np.round(y * 32768.0), -32768, 32767).astype("<i2")
+    return pcm.tobytes()
+
+
+def write_wav(file_path, y, sample_rate=TARGET_SAMPLE_RATE):
+    """Write a decoded array as 16-bit PCM WAV (used for playback only)"""
+    sf.write(file_path, y, sample_rate, subtype="PCM_16")
+    return file_path
@@ -0,0 +1,107 @@
+"""
+Micro-batching for SER application
+Coalesces single-row inference calls from concurrent requests into one
+batched call, so scaling and predict_proba run once per batch
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.utils.metrics import BATCH_ROWS, STAGE_SECONDS
+
+
+class MicroBatcher:
+    """Runs ``fn`` on rows stacked from concurrent callers.
+
+    A worker thread takes the first queued row, then collects more until
+    ``max_rows`` are queued or ``max_wait`` seconds have passed since that
+    row arrived, and calls ``fn`` once on the stacked batch. Every caller
+    gets its own row of the result. When the batch fails, its rows are
+    retried one at a time, so only a failing row's caller gets the
+    exception. Rows that are not 1-D (or not ``n_features`` wide) are
+    rejected by ``submit`` and never reach a batch. The worker thread is
+    started by ``start`` or by the first ``submit``.
+    """
+
+    def __init__(self, fn, max_rows=32, max_wait=0.005, name="microbatch",
+                 n_features=None):
+        self.fn = fn
+        self.n_features = n_features
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, row):
+        """Queue one feature row; returns a Future for its result row"""
+        if row is None:
+            raise ValueError("no feature row to score")
+        row = np.asarray(row)
+        if row.ndim != 1 or (self.n_features is not None and len(row) != self.n_features):
+            raise ValueError(f"expected a row of {self.n_features or 'n'} features, "
+                             f"got shape {row.shape}")
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((row, time.perf_counter(), future))
+        return future
+
+    def __call__(self, row):
+        return self.submit(row).result()
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = items[0][1] + self.max_wait
+        while len(items) < self.max_rows:
+            # Rows already waiting are always taken, even past the deadline
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    items.append(self._queue.get(timeout=timeout))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                start = time.perf_counter()
+                for _, queued, _ in items:
+                    STAGE_SECONDS.observe(start - queued, stage="batch_wait")
+                BATCH_ROWS.observe(len(items))
+                result = self.fn(np.vstack([row for row, _, _ in items]))
+            except Exception as e:
+                if len(items) == 1:
+                    # Failures go to the caller; the worker thread keeps running
+                    items[0][2].set_exception(e)
+                else:
+                    self._run_rows(items)
+                continue
+
+            for (_, _, future), row in zip(items, result):
+                future.set_result(row)
+
+    def _run_rows(self, items):
+        """Score a failed batch row by row, isolating the bad rows"""
+        for row, _, future in items:
+            try:
+                future.set_result(self.fn(row[np.newaxis])[0])
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,223 @@
+"""
+Content-addressed prediction cache for SER application
+Stores features, probabilities and transcripts per decoded clip, keyed by
+a hash of the PCM samples, the scoring settings and the version of the
+model artifact
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents, read in chunks"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Bounded in-memory LRU with an optional on-disk tier.
+
+    The model version is the digest of ``model_path``; it is re-checked on
+    every access through a cheap stat call, and any change drops all
+    entries (memory and disk) and runs ``on_invalidate``.
+
+    ``settings`` names everything else that changes the stored values
+    (feature profile, cascade, early exit). Its digest is the cache's
+    namespace: it is part of every key, and on disk a process only prunes
+    version directories of its own namespace, so processes with different
+    settings can share ``cache_dir``.
+    """
+
+    def __init__(self, model_path, max_entries=256, cache_dir=None,
+                 max_disk_entries=4096, on_invalidate=None, settings=None):
+        self.model_path = model_path
+        self.namespace = hashlib.sha1(
+            repr(sorted((settings or {}).items())).encode()
+        ).hexdigest()[:8]
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.on_invalidate = on_invalidate
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._stat = False  # never equal to a real stat result
+        self.model_version = None
+        self._check_model()
+
+    # -------------------------
+    # Versioning
+    # -------------------------
+    def _check_model(self):
+        try:
+            st = os.stat(self.model_path)
+            stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stat = None
+
+        if stat == self._stat:
+            return
+
+        first_check = self.model_version is None
+        self._stat = stat
+        version = file_digest(self.model_path)[:16] if stat else "none"
+        # A touched but byte-identical model keeps its entries
+        if version == self.model_version:
+            return
+
+        self.model_version = version
+        self._entries.clear()
+        self._prune_disk()
+
+        if not first_check:
+            self.invalidations += 1
+            if self.on_invalidate:
+                self.on_invalidate()
+
+    def _version_dir(self):
+        return os.path.join(self.cache_dir, f"{self.namespace}-{self.model_version}")
+
+    def _prune_disk(self):
+        if not self.cache_dir:
+            return
+        current = os.path.basename(self._version_dir())
+        os.makedirs(self._version_dir(), exist_ok=True)
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(f"{self.namespace}-") and name != current:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def key_for(self, y, sample_rate=16000):
+        """Key for a decoded clip under the current settings and model version"""
+        with self._lock:
+            self._check_model()
+            version = self.model_version
+
+        digest = hashlib.sha256()
+        digest.update(str(sample_rate).encode())
+        digest.update(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+        digest.update(f"{self.namespace}-{version}".encode())
+        return digest.hexdigest()
+
+    def get(self, key, *fields):
+        """Return the cached entry if it holds all fields, counting hit/miss"""
+        with self._lock:
+            self._check_model()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._remember(key, entry)
+            else:
+                self._entries.move_to_end(key)
+
+            if entry is None or any(f not in entry for f in fields):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry
+
+    def peek(self, key):
+        """Entry for key without counting a hit/miss or refreshing it"""
+        with self._lock:
+            self._check_model()
+            return self._entries.get(key) or self._load(key)
+
+    def put(self, key, **fields):
+        """Merge fields into the entry for key and persist it"""
+        with self._lock:
+            self._check_model()
+            entry = dict(self._entries.get(key) or self._load(key) or {})
+            entry.update(fields)
+            self._remember(key, entry)
+            self._store(key, entry)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.cache_dir:
+                shutil.rmtree(self._version_dir(), ignore_errors=True)
+                os.makedirs(self._version_dir(), exist_ok=True)
+
+    def stats(self):
+        with self._lock:
+            self._check_model()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "invalidations": self.invalidations,
+                "model_version": self.model_version,
+                "namespace": self.namespace,
+                "persistent": bool(self.cache_dir)
+            }
+
+    # -------------------------
+    # Storage tiers
+    # -------------------------
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self._version_dir(), key + ".pkl")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            return joblib.load(self._path(key))
+        except Exception:
+            return None
+
+    def _store(self, key, entry):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        try:
+            # A process on another model version may have pruned it
+            os.makedirs(self._version_dir(), exist_ok=True)
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print("Cache write error:", e)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        # Oldest files go first once the disk tier is over its bound
+        names = [n for n in os.listdir(self._version_dir()) if n.endswith(".pkl")]
+        excess = len(names) - self.max_disk_entries
+        if excess <= 0:
+            return
+        paths = [os.path.join(self._version_dir(), n) for n in names]
+        paths.sort(key=lambda p: os.path.getmtime(p))
+        for path in paths[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,275 @@
+"""
+Lightweight metrics for SER application
+Counters, gauges and latency histograms rendered in Prometheus text format
+"""
+
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond inference to long clips
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+_registry = []
+
+# Per-thread callback(name, labels, seconds) for every histogram
+# observation, set while a request is being profiled
+_local = threading.local()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _init_unlabelled(self, value):
+        # Unlabelled series are exported as soon as the metric exists
+        if not self.labelnames:
+            self._values[()] = value
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._init_unlabelled(0)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Settable gauge; with ``fn`` the value is read at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        super().__init__(name, help_text, labelnames)
+        self.fn = fn
+        self._init_unlabelled(0)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in flight"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self):
+        if self.fn is not None:
+            try:
+                self.set(self.fn())
+            except Exception:
+                pass
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _init_unlabelled(self, value):
+        # Histogram series are created by their first observation
+        pass
+
+    def observe(self, value, **labels):
+        recorder = getattr(_local, "recorder", None)
+        if recorder is not None:
+            recorder(self.name, labels, value)
+
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, key, [("le", le)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+@contextmanager
+def record_observations(callback):
+    """Also pass this thread's histogram observations to callback"""
+    previous = getattr(_local, "recorder", None)
+    _local.recorder = callback
+    try:
+        yield
+    finally:
+        _local.recorder = previous
+
+
+def reset():
+    """Drop every recorded value, e.g. after start-up warm-up traffic"""
+    for metric in _registry:
+        with metric._lock:
+            metric._values.clear()
+        metric._init_unlabelled(0)
+
+
+def render():
+    """Every registered metric in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------------
+# Pipeline metrics
+# -------------------------
+REQUESTS = Counter(
+    "ser_requests_total", "Requests handled, by endpoint", ["endpoint"]
+)
+REQUEST_SECONDS = Histogram(
+    "ser_request_duration_seconds", "End-to-end request latency", ["endpoint"]
+)
+IN_FLIGHT = Gauge(
+    "ser_requests_in_flight", "Requests currently being handled", ["endpoint"]
+)
+STAGE_SECONDS = Histogram(
+    "ser_stage_duration_seconds",
+    "Latency of pipeline stages (decode, features, scale, inference, ...)",
+    ["stage"]
+)
+FEATURE_GROUP_SECONDS = Histogram(
+    "ser_feature_group_duration_seconds",
+    "Latency of each feature group; shared STFT/HPSS work lands on the first group using it",
+    ["group"]
+)
+PREDICTIONS = Counter(
+    "ser_predictions_total", "Predictions returned, by emotion", ["emotion"]
+)
+GATED = Counter(
+    "ser_gated_silent_total", "Clips or stream windows gated as silent"
+)
+UNCERTAIN = Counter(
+    "ser_uncertain_total", "Predictions below the confidence threshold"
+)
+TRANSCRIPTIONS = Counter(
+    "ser_transcriptions_total", "Finished transcription jobs, by status", ["status"]
+)
+TRANSCRIPTION_FAILURES = Counter(
+    "ser_transcription_failures_total",
+    "Transcription jobs that failed, were rejected or timed out", ["reason"]
+)
+
+
+STARTUP_SECONDS = Gauge(
+    "ser_startup_seconds", "Time spent in each start-up phase", ["phase"]
+)
+BATCH_ROWS = Histogram(
+    "ser_inference_batch_rows", "Rows per micro-batched inference call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+TREES_EVALUATED = Histogram(
+    "ser_forest_trees_evaluated", "Trees evaluated per row with early exit",
+    buckets=(25, 50, 75, 100, 150, 200, 300, 500)
+)
+CASCADE = Counter(
+    "ser_cascade_clips_total", "Clips decided by each stage of the cascade", ["stage"]
+)
+WORKSPACE_BYTES = Gauge(
+    "ser_workspace_bytes", "Disk used by request workspaces at the last sweep", ["store"]
+)
+WORKSPACE_EVICTIONS = Counter(
+    "ser_workspace_evictions_total",
+    "Workspaces removed by the janitor, by store and reason", ["store", "reason"]
+)
+
+
+def observe_feature_group(group, seconds):
+    """Hook for AudioFeatureExtractor(group_hook=...)"""
+    FEATURE_GROUP_SECONDS.observe(seconds, group=group)
+
+
+def instrument(endpoint):
+    """Count, time and track a Flask view as in flight"""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            REQUESTS.inc(endpoint=endpoint)
+            with IN_FLIGHT.track(endpoint=endpoint), \
+                    REQUEST_SECONDS.time(endpoint=endpoint):
+                return view(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,198 @@
+"""
+On-demand request profiling for SER application
+Samples the Python stacks of selected requests into flamegraph-ready
+collapsed stacks, tagged with the audio length and per-stage timings
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import functools
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from flask import request
+
+from src.utils.metrics import record_observations
+
+PROFILE_HEADER = "X-SER-Profile"
+
+_local = threading.local()
+
+
+def is_profiling():
+    """Whether the current thread is serving a profiled request"""
+    return getattr(_local, "profile", None) is not None
+
+
+def annotate(**tags):
+    """Attach tags (e.g. audio_seconds) to the current profile, if any"""
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        profile["tags"].update(tags)
+
+
+class StackSampler:
+    """Counts one thread's Python stacks, sampled every ``interval`` seconds.
+
+    ``folded()`` returns the collapsed-stack format read by flamegraph.pl,
+    speedscope and inferno: one ``outer;...;inner count`` line per stack.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.counts.most_common())
+
+
+class RequestProfiler:
+    """Profiles the requests an admin asks for, plus 1 in ``sample_every``.
+
+    A request is profiled when it carries ``token`` in the X-SER-Profile
+    header or the ``profile`` query parameter; without a token only
+    sampling applies. Each profile is written to ``root`` as
+    ``<id>.folded`` (stacks) and ``<id>.json`` (tags and timings), and only
+    the newest ``keep`` are retained. Unprofiled requests pay one header
+    lookup and, with sampling on, one counter increment.
+    """
+
+    def __init__(self, root, token=None, sample_every=0, interval=0.001, keep=50):
+        self.root = root
+        self.token = token
+        self.sample_every = sample_every
+        self.interval = interval
+        self.keep = keep
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def is_admin(self, supplied):
+        # Compared as bytes: compare_digest rejects non-ASCII str
+        return bool(self.token and supplied) and hmac.compare_digest(
+            supplied.encode(), self.token.encode()
+        )
+
+    def _reason(self):
+        supplied = request.headers.get(PROFILE_HEADER) or request.args.get("profile")
+        if self.is_admin(supplied):
+            return "requested"
+        if self.sample_every > 0:
+            with self._lock:
+                self._count += 1
+                if self._count % self.sample_every == 0:
+                    return "sampled"
+        return None
+
+    def profiled(self, endpoint):
+        """Decorator: run a Flask view under the profiler when selected"""
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                reason = self._reason()
+                if reason is None:
+                    return view(*args, **kwargs)
+                with self.profile(endpoint, reason):
+                    return view(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    @contextmanager
+    def profile(self, endpoint, reason="requested"):
+        profile = {
+            "id": "{}-{:03d}-{}".format(
+                time.strftime("%Y%m%d-%H%M%S"), int(time.time() * 1000) % 1000,
+                uuid.uuid4().hex[:6]
+            ),
+            "endpoint": endpoint,
+            "reason": reason,
+            "time": time.time(),
+            "tags": {},
+            "timings": defaultdict(lambda: defaultdict(float))
+        }
+
+        def record(name, labels, seconds):
+            label = next(iter(labels.values()), "") if labels else ""
+            profile["timings"][name][label] += seconds
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        _local.profile = profile
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            with record_observations(record):
+                yield profile
+        finally:
+            sampler.stop()
+            profile["seconds"] = round(time.perf_counter() - start, 4)
+            _local.profile = None
+            try:
+                self._save(profile, sampler)
+            except Exception as e:
+                print("Profile write error:", e)
+
+    def _save(self, profile, sampler):
+        os.makedirs(self.root, exist_ok=True)
+        profile["samples"] = sum(sampler.counts.values())
+        profile["timings"] = {
+            name: {label: round(s, 6) for label, s in values.items()}
+            for name, values in profile["timings"].items()
+        }
+        with open(os.path.join(self.root, profile["id"] + ".folded"), "w") as f:
+            f.write(sampler.folded())
+        # The JSON file is written last; list() only shows complete profiles
+        with open(os.path.join(self.root, profile["id"] + ".json"), "w") as f:
+            json.dump(profile, f, indent=2)
+        self._prune()
+
+    def _prune(self):
+        names = sorted(n for n in os.listdir(self.root) if n.endswith(".json"))
+        for name in names[:-self.keep] if self.keep else []:
+            for ext in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.root, name[:-5] + ext))
+                except OSError:
+                    pass
+
+    def list(self, limit=50):
+        """Metadata of the newest profiles, newest first"""
+        if not os.path.isdir(self.root):
+            return []
+        profiles = []
+        names = sorted((n for n in os.listdir(self.root) if n.endswith(".json")), reverse=True)
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(self.root, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
@@ -0,0 +1,212 @@
+"""
+Background transcription for SER application
+Runs speech-to-text on a bounded worker pool so predictions never wait on
+the network, with pluggable recognizer backends
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.audio_io import to_pcm16
+from src.utils.metrics import STAGE_SECONDS, TRANSCRIPTION_FAILURES, TRANSCRIPTIONS
+
+UNCLEAR_TEXT = "Speech not clear enough to transcribe"
+UNAVAILABLE_TEXT = "Speech service unavailable"
+FAILED_TEXT = "Transcript not available"
+BUSY_TEXT = "Transcription queue is full, try again later"
+TIMEOUT_TEXT = "Transcription timed out"
+
+
+class SpeechUnclear(Exception):
+    """Backend could not make out any words"""
+
+
+class ServiceUnavailable(Exception):
+    """Backend could not be reached or refused the request"""
+
+
+class GoogleBackend:
+    """Google Web Speech API through speech_recognition"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._sr = None
+        self.recognizer = None
+
+    def _load(self):
+        # Imported on first use so app startup does not pay for it
+        if self._sr is None:
+            import speech_recognition as sr
+
+            self.recognizer = sr.Recognizer()
+            self.recognizer.operation_timeout = self.timeout
+            self._sr = sr
+
+    def transcribe(self, y, sample_rate):
+        self._load()
+        audio = self._sr.AudioData(to_pcm16(y), sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio)
+        except self._sr.UnknownValueError:
+            raise SpeechUnclear()
+        except self._sr.RequestError as e:
+            raise ServiceUnavailable(str(e))
+
+
+class StaticBackend:
+    """Offline stand-in that returns a fixed transcript (tests, benchmarks)"""
+
+    def __init__(self, text="", delay=0.0, **_):
+        self.text = text
+        self.delay = delay
+
+    def transcribe(self, y, sample_rate):
+        if self.delay:
+            time.sleep(self.delay)
+        if not self.text:
+            raise SpeechUnclear()
+        return self.text
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "static": StaticBackend
+}
+
+
+def register_backend(name, factory):
+    BACKENDS[name] = factory
+
+
+def create_backend(name, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name](**kwargs)
+
+
+class TranscriptionService:
+    """Bounded pool of transcription jobs, addressed by job id.
+
+    ``submit`` never blocks: when ``max_pending`` jobs are already queued
+    the job is finished immediately with a "busy" message. A job that has
+    not finished ``timeout`` seconds after submission reports a timeout.
+    """
+
+    def __init__(self, backend, max_workers=4, max_pending=64, timeout=10,
+                 max_jobs=1024):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="transcribe"
+        )
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, y, sample_rate=16000, on_done=None):
+        """Queue y for transcription and return its job id"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "pending",
+            "transcript": None,
+            "submitted": time.monotonic(),
+            "event": threading.Event()
+        }
+
+        with self._lock:
+            self._remember(job)
+            busy = self._pending >= self.max_pending
+            if not busy:
+                self._pending += 1
+
+        if busy:
+            TRANSCRIPTION_FAILURES.inc(reason="busy")
+            self._finish(job, "failed", BUSY_TEXT)
+        else:
+            self._pool.submit(self._run, job, y, sample_rate, on_done)
+        return job["id"]
+
+    def completed(self, text):
+        """Register an already-known transcript (e.g. a cache hit)"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "done",
+            "transcript": text,
+            "submitted": time.monotonic(),
+            "event": threading.Event()
+        }
+        job["event"].set()
+        with self._lock:
+            self._remember(job)
+        return job["id"]
+
+    def status(self, job_id, wait=0):
+        """Job state as a dict; optionally long-poll up to wait seconds"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return {"id": job_id, "status": "unknown", "transcript": None}
+
+        if wait:
+            remaining = self.timeout - (time.monotonic() - job["submitted"])
+            job["event"].wait(max(0, min(wait, remaining)))
+
+        status, transcript = job["status"], job["transcript"]
+        if status == "pending" and time.monotonic() - job["submitted"] > self.timeout:
+            status, transcript = "timeout", TIMEOUT_TEXT
+            if not job.get("timed_out"):
+                job["timed_out"] = True
+                TRANSCRIPTION_FAILURES.inc(reason="timeout")
+
+        return {"id": job_id, "status": status, "transcript": transcript}
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+    def _run(self, job, y, sample_rate, on_done):
+        start = time.perf_counter()
+        try:
+            text = self.backend.transcribe(y, sample_rate)
+            print("TRANSCRIPT:", text)
+            status = "done"
+        except SpeechUnclear:
+            print("Transcript: Speech not clear")
+            text, status = UNCLEAR_TEXT, "done"
+        except ServiceUnavailable as e:
+            print("Transcript API error:", e)
+            text, status = UNAVAILABLE_TEXT, "failed"
+            TRANSCRIPTION_FAILURES.inc(reason="unavailable")
+        except Exception as e:
+            print("Transcript error:", e)
+            text, status = FAILED_TEXT, "failed"
+            TRANSCRIPTION_FAILURES.inc(reason="error")
+        finally:
+            with self._lock:
+                self._pending -= 1
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="transcription")
+
+        TRANSCRIPTIONS.inc(status=status)
+
+        self._finish(job, status, text)
+        if on_done and status == "done":
+            on_done(text)
+
+    def _finish(self, job, status, text):
+        job["status"] = status
+        job["transcript"] = text
+        job["event"].set()
+
+    def _remember(self, job):
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
@@ -0,0 +1,194 @@
+"""
+Per-request file storage for SER application
+Gives every request its own uniquely named directory and removes old ones
+in the background to enforce a time-to-live and a disk quota
+"""
+
+import os
+import time
+import uuid
+import shutil
+import threading
+from contextlib import contextmanager
+
+from werkzeug.utils import secure_filename
+
+from src.utils.metrics import WORKSPACE_BYTES, WORKSPACE_EVICTIONS
+
+# Marks a workspace as in use by some process: ".<id>.in_use" next to it
+LOCK_SUFFIX = ".in_use"
+
+
+def _entry_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class Workspace:
+    """A request's private directory; files are served under ``url_prefix``"""
+
+    def __init__(self, workspace_id, path, url_prefix):
+        self.id = workspace_id
+        self.path = path
+        self.url_prefix = url_prefix
+
+    def file(self, filename, default="upload"):
+        """Local path for a client-supplied filename, made safe"""
+        return os.path.join(self.path, secure_filename(filename or "") or default)
+
+    def url(self, path):
+        return f"{self.url_prefix}/{self.id}/{os.path.basename(path)}"
+
+
+class WorkspaceStore:
+    """Unique workspaces under ``root`` with a TTL and a size quota.
+
+    Workspaces are only removed once their request has finished, and the
+    TTL counts from that moment, so playback URLs stay valid until they
+    expire. When the store exceeds ``max_bytes`` the oldest finished
+    workspaces go first. Loose files in ``root`` (e.g. from older versions)
+    are aged the same way.
+
+    A workspace in use has a lock file next to it, so stores of several
+    worker processes can share ``root``. A lock older than ``lock_timeout``
+    was left by a process that died mid-request and is ignored.
+    """
+
+    def __init__(self, name, root, url_prefix, ttl=3600, max_bytes=500 << 20,
+                 lock_timeout=3600):
+        self.name = name
+        self.root = root
+        self.url_prefix = url_prefix
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock_timeout = lock_timeout
+        os.makedirs(root, exist_ok=True)
+
+    def _lock_path(self, workspace_id):
+        return os.path.join(self.root, f".{workspace_id}{LOCK_SUFFIX}")
+
+    @contextmanager
+    def workspace(self, keep=True):
+        """Create a workspace for one request; ``keep=False`` deletes it after"""
+        workspace_id = uuid.uuid4().hex
+        path = os.path.join(self.root, workspace_id)
+        lock = self._lock_path(workspace_id)
+        # Locked before it exists, so no process's sweep sees it unprotected
+        with open(lock, "w") as f:
+            f.write(str(os.getpid()))
+        try:
+            os.makedirs(path)
+        except OSError:
+            _remove(lock)
+            raise
+        try:
+            yield Workspace(workspace_id, path, self.url_prefix)
+        finally:
+            if keep:
+                # The TTL starts when the request is done with its files
+                os.utime(path)
+            else:
+                _remove(path)
+            _remove(lock)
+
+    def _locked(self, now):
+        """Ids of workspaces in use by any process; drops stale locks"""
+        locked = set()
+        for name in os.listdir(self.root):
+            if not (name.startswith(".") and name.endswith(LOCK_SUFFIX)):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue  # its request just finished
+            if age > self.lock_timeout:
+                _remove(path)
+                continue
+            locked.add(name[1:-len(LOCK_SUFFIX)])
+        return locked
+
+    def sweep(self, now=None):
+        """Remove expired workspaces, then the oldest ones over quota.
+
+        Returns the number of bytes still in use.
+        """
+        now = time.time() if now is None else now
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(LOCK_SUFFIX):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                entries.append((os.path.getmtime(path), _entry_size(path), name, path))
+            except OSError:
+                continue  # removed while we were looking
+
+        # Read after listing: every listed workspace still in use is in here
+        active = self._locked(now)
+
+        used = sum(size for _, size, _, _ in entries)
+        for mtime, size, name, path in sorted(entries):
+            if name in active:
+                continue
+            if now - mtime > self.ttl:
+                reason = "expired"
+            elif used > self.max_bytes:
+                reason = "quota"
+            else:
+                continue
+            _remove(path)
+            used -= size
+            WORKSPACE_EVICTIONS.inc(store=self.name, reason=reason)
+
+        WORKSPACE_BYTES.set(used, store=self.name)
+        return used
+
+
+class Janitor:
+    """Daemon thread sweeping a set of stores every ``interval`` seconds"""
+
+    def __init__(self, stores, interval=60):
+        self.stores = stores
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sweep(self):
+        for store in self.stores:
+            try:
+                store.sweep()
+            except Exception as e:
+                print(f"Workspace sweep failed for {store.name}:", e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sweep()
+
+    def start(self):
+        self.sweep()
+        self._thread = threading.Thread(
+            target=self._run, name="workspace-janitor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()